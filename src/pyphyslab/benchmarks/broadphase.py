@@ -0,0 +1,56 @@
+import pathlib
+import sys
+import time
+
+package_dir = str(pathlib.Path(__file__).resolve().parents[2])
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyphyslab.physics.broadphase import make_broadphase, GRID_BROADPHASE, SWEEP_AND_PRUNE_BROADPHASE
+
+CONTACT_RADIUS = 0.1
+STEPS = 20
+# Per step motion: lively, and close to resting. Sweep and prune gains when the endpoints barely reorder
+STEP_JITTERS = (0.002, 0.0002)
+
+
+def uniform_positions(rng, count):
+    side = (count / 2.0) ** (1.0 / 3.0) * CONTACT_RADIUS * 2
+    return rng.random((count, 3)) * side
+
+
+def clustered_positions(rng, count, clusters=8):
+    centers = uniform_positions(rng, clusters) * 20
+    owner = rng.integers(0, clusters, count)
+    return centers[owner] + rng.normal(scale=CONTACT_RADIUS * 3, size=(count, 3))
+
+
+def run(name, position, rng, jitter):
+    broadphase = make_broadphase(name, CONTACT_RADIUS)
+    broadphase.find_pairs(position)
+
+    pair_count = 0
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        position += rng.normal(scale=jitter, size=position.shape)
+        first, _ = broadphase.find_pairs(position)
+        pair_count += len(first)
+    elapsed = time.perf_counter() - start
+    return elapsed / STEPS, pair_count / STEPS
+
+
+def main():
+    print("%-10s %8s %8s %-16s %12s %12s" % ("layout", "count", "jitter", "broadphase", "ms / step", "pairs"))
+    for layout, generate in (("uniform", uniform_positions), ("clustered", clustered_positions)):
+        for count in (1000, 4000, 16000):
+            initial = generate(np.random.default_rng(1), count)
+            for jitter in STEP_JITTERS:
+                for name in (GRID_BROADPHASE, SWEEP_AND_PRUNE_BROADPHASE):
+                    seconds, pairs = run(name, initial.copy(), np.random.default_rng(2), jitter)
+                    print("%-10s %8d %8g %-16s %12.3f %12.0f" % (layout, count, jitter, name, seconds * 1000, pairs))
+
+
+if __name__ == "__main__":
+    main()
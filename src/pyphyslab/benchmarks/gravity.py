@@ -0,0 +1,53 @@
+import pathlib
+import sys
+import time
+
+package_dir = str(pathlib.Path(__file__).resolve().parents[2])
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyphyslab.physics.octree import Octree, barnes_hut_acceleration, direct_acceleration
+
+THETA = 0.5
+SOFTENING = 1e-3
+# Direct summation is timed on a sample of targets and scaled up to all of them
+DIRECT_SAMPLE = 1000
+
+
+def plummer_cloud(rng, count):
+    radius = 1.0 / np.sqrt(rng.random(count) ** (-2.0 / 3.0) - 1.0)
+    direction = rng.normal(size=(count, 3))
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    return np.minimum(radius, 50.0)[:, np.newaxis] * direction
+
+
+def run(count, rng):
+    position = plummer_cloud(rng, count)
+    mass = np.full(count, 1.0 / count)
+
+    start = time.perf_counter()
+    tree = Octree(position, mass)
+    build = time.perf_counter() - start
+    acceleration = barnes_hut_acceleration(position, mass, theta=THETA, softening=SOFTENING, tree=tree)
+    barnes_hut = time.perf_counter() - start
+
+    sample = rng.choice(count, min(DIRECT_SAMPLE, count), replace=False)
+    start = time.perf_counter()
+    exact = direct_acceleration(position, mass, softening=SOFTENING, targets=sample)
+    direct = (time.perf_counter() - start) * count / len(sample)
+
+    error = np.linalg.norm(acceleration[sample] - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    return build, barnes_hut, direct, np.median(error), len(tree)
+
+
+def main():
+    print("%8s %8s %10s %14s %16s %12s" % ("count", "nodes", "build ms", "barnes-hut ms", "direct ms (est)", "median err"))
+    for count in (1000, 3000, 10000, 30000, 100000):
+        build, barnes_hut, direct, error, nodes = run(count, np.random.default_rng(1))
+        print("%8d %8d %10.1f %14.1f %16.1f %12.2e" % (count, nodes, build * 1000, barnes_hut * 1000, direct * 1000, error))
+
+
+if __name__ == "__main__":
+    main()
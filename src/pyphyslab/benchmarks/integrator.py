@@ -0,0 +1,62 @@
+import pathlib
+import sys
+import time
+
+package_dir = str(pathlib.Path(__file__).resolve().parents[2])
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyphyslab.physics.particle import ParticleSystem
+from pyphyslab.physics.integrator import EXPLICIT_EULER, SEMI_IMPLICIT_EULER, VELOCITY_VERLET, RK4
+
+# Every particle hangs on an anchored spring with no damping, so total energy must stay constant
+SPRING_CONSTANT = 40.0
+PARTICLE_COUNT = 10000
+SIMULATED_TIME = 10.0
+
+
+def spring_acceleration(position, velocity):
+    return -SPRING_CONSTANT * position
+
+
+def energy(system):
+    kinetic = 0.5 * np.sum(system.velocity ** 2, axis=1) / system.inverse_mass
+    potential = 0.5 * SPRING_CONSTANT * np.sum(system.position ** 2, axis=1) / system.inverse_mass
+    return float(np.sum(kinetic + potential))
+
+
+def make_system(integrator):
+    rng = np.random.default_rng(1)
+    system = ParticleSystem(capacity=PARTICLE_COUNT, integrator=integrator)
+    for position in rng.normal(size=(PARTICLE_COUNT, 3)):
+        system.add(mass=1.0, damping=1.0, position=position)
+    return system
+
+
+def run(integrator, delta_time):
+    system = make_system(integrator)
+    initial_energy = energy(system)
+    steps = int(round(SIMULATED_TIME / delta_time))
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        system.integrate(delta_time, spring_acceleration)
+    elapsed = time.perf_counter() - start
+
+    drift = (energy(system) - initial_energy) / initial_energy
+    return elapsed / steps, drift
+
+
+def main():
+    print("%d particles, %.0f s simulated, spring period %.3f s" % (PARTICLE_COUNT, SIMULATED_TIME, 2 * np.pi / np.sqrt(SPRING_CONSTANT)))
+    print("%-20s %10s %14s %16s" % ("integrator", "dt", "us / step", "energy drift"))
+    for delta_time in (1 / 240, 1 / 60, 1 / 20):
+        for integrator in (EXPLICIT_EULER, SEMI_IMPLICIT_EULER, VELOCITY_VERLET, RK4):
+            seconds, drift = run(integrator, delta_time)
+            print("%-20s %10.4f %14.1f %+16.3e" % (integrator, delta_time, seconds * 1e6, drift))
+
+
+if __name__ == "__main__":
+    main()
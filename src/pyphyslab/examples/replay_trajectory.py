@@ -0,0 +1,80 @@
+import pathlib
+import sys
+import math
+
+package_dir = str(pathlib.Path(__file__).resolve().parents[2])
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyphyslab.core.window import Window
+from pyphyslab.scene.renderer import Renderer
+from pyphyslab.scene.camera import Camera, MovementRig
+from pyphyslab.scene.shape import Mesh
+from pyphyslab.scene.scene import Scene
+from pyphyslab.scene.grid import Grid
+from pyphyslab.scene.replay import TrajectoryReplay
+from pyphyslab.primitive.ellipsoid import EllipsoidPrimitive
+from pyphyslab.material.surface import SurfaceMaterial
+from pyphyslab.physics.recorder import TrajectoryRecorder, load_trajectory
+from pyphyslab.physics.runner import Scenario
+
+TRAJECTORY_DIRECTORY = "trajectory"
+
+class Example(Window):
+    """ Plays back a recorded run. Z / X - slower / faster, C - pause, V - back to the start """
+
+    def initialize(self):
+        print("Initializing program...")
+        self.renderer = Renderer()
+        self.scene = Scene()
+        self.camera = Camera(aspect_ratio=1024/768)
+        self.camera.set_position([0.0, 1.0, -2.0])
+        self.rig = MovementRig()
+        self.rig.add(self.camera)
+        self.rig.set_position([0.0, 0.0, 0.0])
+        self.scene.add(self.rig)
+
+        if not pathlib.Path(TRAJECTORY_DIRECTORY).exists():
+            self._record()
+
+        particle_count = load_trajectory(TRAJECTORY_DIRECTORY)["position"].shape[1]
+        spheres = []
+        for _ in range(particle_count):
+            sphere = Mesh(EllipsoidPrimitive(width=0.1, height=0.1, depth=0.1), SurfaceMaterial(property_dict={"baseColor": [0, 1, 1]}))
+            self.scene.add(sphere)
+            spheres.append(sphere)
+
+        grid = Grid(
+            size=20,
+            grid_color=[1, 1, 1],
+            center_color=[1, 1, 0]
+        )
+        grid.rotate_x(-math.pi / 2)
+        self.scene.add(grid)
+
+        self.replay = TrajectoryReplay(TRAJECTORY_DIRECTORY, spheres, loop=True)
+
+    def _record(self):
+        scenario = Scenario.two_particle_contact(steps=1200)
+        world = scenario.build_world()
+        with world.attach_recorder(TrajectoryRecorder(TRAJECTORY_DIRECTORY)):
+            for _ in range(scenario.steps):
+                world.run_physics(scenario.delta_time)
+
+    def update(self):
+        if self.key_input.is_key_down("z"):
+            self.replay.speed /= 2
+        if self.key_input.is_key_down("x"):
+            self.replay.speed *= 2
+        if self.key_input.is_key_down("c"):
+            self.replay.paused = not self.replay.paused
+        if self.key_input.is_key_down("v"):
+            self.replay.seek(self.replay.start_time)
+
+        self.replay.update(self.delta_time)
+
+        self.rig.update(self.key_input, self.mouse_input, self.delta_time)
+        self.renderer.render(self.scene, self.camera)
+
+
+Example(screen_size=(1024,768)).run()
@@ -21,6 +21,7 @@ from pyphyslab.material.surface import SurfaceMaterial
 
 from pyphyslab.physics.particle import Particle
 from pyphyslab.physics.world import World
+from pyphyslab.physics.stepper import FixedTimestep
 from pyphyslab.scene.hud import HeadsUpDisplay
 
 class Test(Window):
@@ -73,16 +74,17 @@ class Test(Window):
         grid.rotate_x(-math.pi / 2)
         self.scene.add(grid)
         self.world = World(self.p1, self.p2)
+        self.stepper = FixedTimestep(self.world, step=1 / 240)
         self.hud = HeadsUpDisplay(screen_size=(1024, 768))
 
     def update(self):
         if (self.rig.activated == True):
-            self.world.run_physics(self.delta_time)
+            self.stepper.advance(self.delta_time)
 
-            position = self.p1.position.tolist()
+            position = self.stepper.interpolate(self.p1).tolist()
             self.sphere1.set_position(position)
 
-            position = self.p2.position.tolist()   
+            position = self.stepper.interpolate(self.p2).tolist()
             self.sphere2.set_position(position)
 
         self.rig.update(self.key_input, self.mouse_input, self.delta_time)
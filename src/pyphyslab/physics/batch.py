@@ -0,0 +1,118 @@
+import numpy as np
+
+from pyphyslab.physics.particle import ParticleSystem
+from pyphyslab.physics.collision import ParticleCollisionDetector, BatchContactResolver, ParticleContactResolver
+from pyphyslab.physics.collider import StaticColliderSet, PlaneCollider
+from pyphyslab.physics.integrator import EXPLICIT_EULER
+from pyphyslab.physics.world import World
+
+
+class BatchedWorld:
+    """ B independent copies of a small world stepped together. The state of all worlds lives in one
+        flat particle system of B * N slots and is exposed as (B, N, 3) / (B, N) views, so contacts,
+        static colliders and integration each run as a handful of array operations over every world.
+        Particles only interact with particles of their own world; every pair inside a world is a candidate """
+
+    def __init__(self, mass, position, velocity=None, acceleration=None, damping=0.85, force=None,
+                 contact_radius=World.CONTACT_RADIUS, contact_iterations=1, ground=True, integrator=EXPLICIT_EULER):
+        position = np.asarray(position, dtype=float)
+        if position.ndim != 3 or position.shape[2] != 3:
+            raise ValueError("position must have shape (B, N, 3)")
+
+        self._batch_size, self._count = position.shape[:2]
+        shape = position.shape
+
+        self._system = ParticleSystem(capacity=self._batch_size * self._count, integrator=integrator)
+        self._system.add_many(mass=np.ones(self._batch_size * self._count))
+
+        self.position[...] = position
+        self.velocity[...] = np.broadcast_to(0.0 if velocity is None else velocity, shape)
+        self.acceleration[...] = np.broadcast_to(0.0 if acceleration is None else acceleration, shape)
+        self.accumulated_force[...] = np.broadcast_to(0.0 if force is None else force, shape)
+        self.inverse_mass[...] = 1.0 / np.broadcast_to(mass, shape[:2])
+        self.damping[...] = np.broadcast_to(damping, shape[:2])
+
+        self._system.radius[:] = contact_radius / 2
+        self._particle_collision_detector = ParticleCollisionDetector()
+        self._contact_resolver = BatchContactResolver(contact_iterations)
+        self._static_colliders = StaticColliderSet()
+        if ground:
+            self._static_colliders.add(PlaneCollider.ground())
+
+        first, second = np.triu_indices(self._count, 1)
+        world_offset = (np.arange(self._batch_size) * self._count)[:, np.newaxis]
+        self._first = (world_offset + first).ravel()
+        self._second = (world_offset + second).ravel()
+
+    @classmethod
+    def from_scenarios(cls, scenarios, **world_options):
+        """ Stack scenarios with the same particle count into one batch """
+        specs = [scenario.particles for scenario in scenarios]
+        if len({len(particles) for particles in specs}) != 1:
+            raise ValueError("All scenarios must have the same number of particles")
+
+        def column(name):
+            return np.array([[getattr(particle, name) for particle in particles] for particles in specs], dtype=float)
+
+        return cls(
+            mass=column("mass"),
+            position=column("position"),
+            velocity=column("velocity"),
+            acceleration=column("acceleration"),
+            damping=column("damping"),
+            force=column("force"),
+            **world_options
+        )
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def system(self):
+        """ The flat B * N particle system backing the batch """
+        return self._system
+
+    @property
+    def static_colliders(self):
+        return self._static_colliders
+
+    @property
+    def position(self):
+        return self._system.position.reshape(self._batch_size, self._count, 3)
+
+    @property
+    def velocity(self):
+        return self._system.velocity.reshape(self._batch_size, self._count, 3)
+
+    @property
+    def acceleration(self):
+        return self._system.acceleration.reshape(self._batch_size, self._count, 3)
+
+    @property
+    def accumulated_force(self):
+        return self._system.accumulated_force.reshape(self._batch_size, self._count, 3)
+
+    @property
+    def inverse_mass(self):
+        return self._system.inverse_mass.reshape(self._batch_size, self._count)
+
+    @property
+    def damping(self):
+        return self._system.damping.reshape(self._batch_size, self._count)
+
+    def add_static_collider(self, collider):
+        return self._static_colliders.add(collider)
+
+    def run_physics(self, delta_time):
+        first, second, contact_normal = self._particle_collision_detector.detect_pairs(self._system, self._first, self._second)
+        self._contact_resolver.resolve(self._system, first, second, contact_normal, ParticleContactResolver.RESTITUTION, delta_time)
+
+        particle, collider, contact_normal, distance = self._static_colliders.detect(self._system)
+        self._static_colliders.resolve(self._system, particle, collider, contact_normal, distance, delta_time)
+
+        self._system.integrate(delta_time)
@@ -0,0 +1,362 @@
+import numpy as np
+
+_CELL_BITS = 21
+_CELL_BIAS = 1 << (_CELL_BITS - 1)
+_CELL_MASK = (1 << _CELL_BITS) - 1
+
+# The cell itself plus the 13 neighbours "ahead" of it. Every unordered pair of
+# neighbouring cells is visited exactly once.
+_HALF_NEIGHBOURHOOD = np.array(
+    [[0, 0, 0]] +
+    [[dx, dy, dz]
+     for dx in (-1, 0, 1)
+     for dy in (-1, 0, 1)
+     for dz in (-1, 0, 1)
+     if (dx, dy, dz) > (0, 0, 0)],
+    dtype=np.int64
+)
+
+_FULL_NEIGHBOURHOOD = np.array(
+    [[dx, dy, dz] for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)],
+    dtype=np.int64
+)
+
+
+def pack_cells(cells):
+    """ Pack (N, 3) integer cell coordinates into one int64 key per row """
+    biased = (cells + _CELL_BIAS) & _CELL_MASK
+    return (biased[:, 0] << (2 * _CELL_BITS)) | (biased[:, 1] << _CELL_BITS) | biased[:, 2]
+
+
+def expand_ranges(start, end):
+    """ Concatenate the index ranges [start[k], end[k]) and return them with the owning k """
+    counts = np.maximum(end - start, 0)
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(counts)), counts)
+    if total == 0:
+        return owner, owner.copy()
+    run_start = np.cumsum(counts) - counts
+    index = np.arange(total) - run_start[owner] + start[owner]
+    return owner, index
+
+
+# Boxes covering more grid cells than this are tested against every box instead of cell by cell
+_MAX_BOX_CELLS = 512
+# Largest number of (wide box, box) overlap tests done at once
+_CHUNK_ELEMENTS = 1 << 22
+
+
+def _box_cells(lower, upper, cell_size):
+    """ Packed keys of every grid cell touched by each box, with the owning box """
+    low = np.floor(lower / cell_size).astype(np.int64)
+    span = np.floor(upper / cell_size).astype(np.int64) - low + 1
+    owner, local = expand_ranges(np.zeros(len(low), dtype=np.int64), np.prod(span, axis=1))
+    span_x = span[owner, 0]
+    span_y = span[owner, 1]
+    cells = low[owner] + np.stack((local % span_x, (local // span_x) % span_y, local // (span_x * span_y)), axis=1)
+    return owner, pack_cells(cells)
+
+
+def box_pairs(lower, upper, query, cell_size):
+    """ Pairs (first < second) of overlapping axis aligned boxes with at least one box in the query mask.
+        Every box is hashed into the grid cells it touches and the query boxes only look up their own cells,
+        so the cost scales with the query boxes and their neighbourhoods. Query boxes wider than
+        _MAX_BOX_CELLS cells are tested against all boxes """
+    count = len(lower)
+    query = np.flatnonzero(query)
+    if len(query) == 0 or count < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.copy()
+
+    spans = np.floor(upper[query] / cell_size) - np.floor(lower[query] / cell_size) + 1
+    wide = np.prod(spans, axis=1) > _MAX_BOX_CELLS
+    narrow_query = query[~wide]
+
+    # Boxes other than the narrow queries only need hashing when they are narrow as well
+    spans = np.floor(upper / cell_size) - np.floor(lower / cell_size) + 1
+    hashed = np.flatnonzero(np.prod(spans, axis=1) <= _MAX_BOX_CELLS)
+    owner, keys = _box_cells(lower[hashed], upper[hashed], cell_size)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_box = hashed[owner[order]]
+
+    query_owner, query_keys = _box_cells(lower[narrow_query], upper[narrow_query], cell_size)
+    start = np.searchsorted(sorted_keys, query_keys, side="left")
+    end = np.searchsorted(sorted_keys, query_keys, side="right")
+    owner, partner = expand_ranges(start, end)
+    first_list = [narrow_query[query_owner[owner]]]
+    second_list = [sorted_box[partner]]
+
+    # Wide query boxes, and narrow queries against wide boxes, which were not hashed
+    unhashed = np.ones(count, dtype=bool)
+    unhashed[hashed] = False
+    wide_boxes = np.union1d(query[wide], np.flatnonzero(unhashed))
+    rows = max(_CHUNK_ELEMENTS // count, 1)
+    for chunk_start in range(0, len(wide_boxes), rows):
+        box = wide_boxes[chunk_start:chunk_start + rows]
+        overlap = np.all((lower[box, np.newaxis] <= upper) & (lower <= upper[box, np.newaxis]), axis=2)
+        row, other = np.nonzero(overlap)
+        first_list.append(box[row])
+        second_list.append(other)
+
+    first = np.concatenate(first_list)
+    second = np.concatenate(second_list)
+    in_query = np.zeros(count, dtype=bool)
+    in_query[query] = True
+    keep = (first != second) & (in_query[first] | in_query[second])
+    keep &= np.all((lower[first] <= upper[second]) & (lower[second] <= upper[first]), axis=1)
+    first, second = np.minimum(first, second)[keep], np.maximum(first, second)[keep]
+    # A pair sharing several cells is found once per cell
+    keys = np.unique(first * count + second)
+    return keys // count, keys % count
+
+
+class SpatialHashBroadphase:
+    """ Uniform grid broadphase. Candidate pairs share a cell or sit in neighbouring cells """
+
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self._cell_size = cell_size
+
+    @property
+    def cell_size(self):
+        return self._cell_size
+
+    def find_pairs(self, position, active=None):
+        """ Return two index arrays (first < second) of the candidate pairs.
+            With an active mask only pairs with at least one active particle are returned
+            and the neighbour search cost scales with the active particles """
+        count = len(position)
+        if count < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.copy()
+
+        cells = np.floor(position / self._cell_size).astype(np.int64)
+        keys = pack_cells(cells)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        if active is not None:
+            return self._find_active_pairs(cells, order, sorted_keys, active)
+
+        sorted_cells = cells[order]
+        rank = np.arange(count)
+
+        first_list = []
+        second_list = []
+        for offset in _HALF_NEIGHBOURHOOD:
+            if not offset.any():
+                start = rank + 1
+                end = np.searchsorted(sorted_keys, sorted_keys, side="right")
+            else:
+                neighbour_keys = pack_cells(sorted_cells + offset)
+                start = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+                end = np.searchsorted(sorted_keys, neighbour_keys, side="right")
+
+            owner, partner = expand_ranges(start, end)
+            first_list.append(order[owner])
+            second_list.append(order[partner])
+
+        first = np.concatenate(first_list)
+        second = np.concatenate(second_list)
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def _find_active_pairs(self, cells, order, sorted_keys, active):
+        query = np.flatnonzero(active)
+        query_cells = cells[query]
+
+        first_list = []
+        second_list = []
+        for offset in _FULL_NEIGHBOURHOOD:
+            neighbour_keys = pack_cells(query_cells + offset)
+            start = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+            end = np.searchsorted(sorted_keys, neighbour_keys, side="right")
+
+            owner, partner = expand_ranges(start, end)
+            first = query[owner]
+            second = order[partner]
+            # Pairs of two active particles are found from both sides, keep one of them
+            keep = (first != second) & (~active[second] | (second > first))
+            first_list.append(first[keep])
+            second_list.append(second[keep])
+
+        first = np.concatenate(first_list)
+        second = np.concatenate(second_list)
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def find_box_pairs(self, lower, upper, query):
+        """ Overlapping pairs of arbitrary boxes with at least one query box, hashed at the cell size """
+        return box_pairs(lower, upper, query, self._cell_size)
+
+
+def _boxes_overlap(lower, upper, first, second):
+    """ Mask of the overlapping box pairs. Gathering one contiguous axis at a time is several times faster
+        than gathering whole rows """
+    overlap = np.ones(len(first), dtype=bool)
+    for axis in range(3):
+        axis_lower = np.ascontiguousarray(lower[:, axis])
+        axis_upper = np.ascontiguousarray(upper[:, axis])
+        overlap &= (axis_lower[first] <= axis_upper[second]) & (axis_lower[second] <= axis_upper[first])
+    return overlap
+
+
+# Repairing the orderings visits a window of endpoints around every moved one. When the windows add up to
+# more than this many times the candidates of the last rebuild, rebuilding the pair set is cheaper
+_REBUILD_RATIO = 2
+
+
+class SweepAndPruneBroadphase:
+    """ Sweep and prune over persistent per axis orderings of the box endpoints, which keeps the set of
+        overlapping pairs between steps. Every step the orderings are repaired with an adaptive stable sort,
+        close to linear when the particles only move a little, and the pairs whose overlap can have changed
+        are the minimum and maximum endpoints which swapped places. Only those are tested again, so the pair
+        work scales with the motion rather than the population. The first step, a changed particle count or
+        a large reshuffle rebuild the pair set with a grid search """
+
+    def __init__(self, half_extent):
+        if half_extent <= 0:
+            raise ValueError("half_extent must be positive")
+        self._half_extent = half_extent
+        self._endpoint_order = None
+        self._pair_keys = np.empty(0, dtype=np.int64)
+        self._added_pairs = np.empty(0, dtype=np.int64)
+        self._removed_pairs = np.empty(0, dtype=np.int64)
+        self._rebuild_work = 0
+        self._count = 0
+
+    @property
+    def half_extent(self):
+        return self._half_extent
+
+    @property
+    def added_pairs(self):
+        """ Pairs which started overlapping in the last update """
+        return self._unpack(self._added_pairs)
+
+    @property
+    def removed_pairs(self):
+        """ Pairs which stopped overlapping in the last update """
+        return self._unpack(self._removed_pairs)
+
+    def find_pairs(self, position, active=None):
+        """ Return two index arrays (first < second) of the overlapping pairs.
+            With an active mask pairs of two inactive particles are left out """
+        count = len(position)
+        if count != self._count:
+            self._count = count
+            self._endpoint_order = None
+            self._pair_keys = np.empty(0, dtype=np.int64)
+
+        if count < 2:
+            self._added_pairs = np.empty(0, dtype=np.int64)
+            self._removed_pairs = np.empty(0, dtype=np.int64)
+            return self._unpack(self._pair_keys)
+
+        box_min = position - self._half_extent
+        box_max = position + self._half_extent
+        # Maximums are nudged up by one ulp so a minimum equal to a maximum sorts before it, as the
+        # boxes overlap then
+        endpoints = np.concatenate((box_min, np.nextafter(box_max, np.inf)))
+
+        candidates = None if self._endpoint_order is None else self._swapped_pairs(endpoints)
+        if candidates is None:
+            self._rebuild(box_min, box_max, endpoints)
+        else:
+            self._update(box_min, box_max, *candidates)
+
+        first, second = self._unpack(self._pair_keys)
+        if active is not None:
+            involves_active = active[first] | active[second]
+            first, second = first[involves_active], second[involves_active]
+        return first, second
+
+    def find_box_pairs(self, lower, upper, query):
+        """ Overlapping pairs of arbitrary boxes with at least one query box, hashed at the extent of a box """
+        return box_pairs(lower, upper, query, 2 * self._half_extent)
+
+    def _rebuild(self, box_min, box_max, endpoints):
+        self._endpoint_order = [np.argsort(endpoints[:, axis], kind="stable") for axis in range(3)]
+        # The boxes are cubes of one size, so overlapping ones sit in neighbouring cells of that size
+        first, second = SpatialHashBroadphase(2 * self._half_extent).find_pairs(box_min)
+        self._rebuild_work = len(first) + self._count
+        overlapping = _boxes_overlap(box_min, box_max, first, second)
+        # The grid finds every pair once
+        pair_keys = np.sort(first[overlapping] * self._count + second[overlapping])
+        self._added_pairs = np.setdiff1d(pair_keys, self._pair_keys, assume_unique=True)
+        self._removed_pairs = np.setdiff1d(self._pair_keys, pair_keys, assume_unique=True)
+        self._pair_keys = pair_keys
+
+    def _swapped_pairs(self, endpoints):
+        """ Repair the orderings and return the (first, second) boxes of every minimum and maximum endpoint
+            which swapped places on some axis, or None when that is more work than a rebuild """
+        count = self._count
+        work = 0
+        orders = []
+        first_list = []
+        second_list = []
+        for axis in range(3):
+            order = self._endpoint_order[axis]
+            # Old rank of the endpoint at every new position. Swapped endpoints are its inversions
+            rank = np.argsort(endpoints[order, axis], kind="stable")
+            order = order[rank]
+            orders.append(order)
+
+            # The endpoints after position k with a lower rank all come before the first position from
+            # which every rank is at least rank[k]
+            suffix_minimum = np.minimum.accumulate(rank[::-1])[::-1]
+            start = np.arange(1, len(rank) + 1)
+            end = np.searchsorted(suffix_minimum, rank, side="left")
+            work += int(np.maximum(end - start, 0).sum())
+            if work > _REBUILD_RATIO * self._rebuild_work:
+                return None
+
+            owner, partner = expand_ranges(start, end)
+            swapped = rank[partner] < rank[owner]
+            endpoint = order[owner[swapped]]
+            other = order[partner[swapped]]
+            keep = ((endpoint < count) != (other < count)) & (endpoint % count != other % count)
+            first_list.append(endpoint[keep] % count)
+            second_list.append(other[keep] % count)
+
+        self._endpoint_order = orders
+        first = np.concatenate(first_list)
+        second = np.concatenate(second_list)
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def _update(self, box_min, box_max, first, second):
+        keys = first * self._count + second
+        overlapping = _boxes_overlap(box_min, box_max, first, second)
+        known = np.zeros(len(keys), dtype=bool)
+        if len(self._pair_keys):
+            slot = np.minimum(np.searchsorted(self._pair_keys, keys), len(self._pair_keys) - 1)
+            known = self._pair_keys[slot] == keys
+
+        # Most swaps are of boxes far apart on the other axes, which neither overlap now nor did before.
+        # A pair can swap on several axes, so the changes are deduplicated
+        self._added_pairs = np.unique(keys[overlapping & ~known])
+        self._removed_pairs = np.unique(keys[~overlapping & known])
+
+        pair_keys = self._pair_keys
+        if len(self._removed_pairs):
+            pair_keys = pair_keys[~np.isin(pair_keys, self._removed_pairs, assume_unique=True)]
+        if len(self._added_pairs):
+            pair_keys = np.insert(pair_keys, np.searchsorted(pair_keys, self._added_pairs), self._added_pairs)
+        self._pair_keys = pair_keys
+
+    def _unpack(self, pair_keys):
+        count = max(self._count, 1)
+        return pair_keys // count, pair_keys % count
+
+
+GRID_BROADPHASE = "grid"
+SWEEP_AND_PRUNE_BROADPHASE = "sweep_and_prune"
+
+
+def make_broadphase(name, contact_radius):
+    """ Create a broadphase by name, sized from the contact radius """
+    if name == GRID_BROADPHASE:
+        return SpatialHashBroadphase(cell_size=contact_radius)
+    if name == SWEEP_AND_PRUNE_BROADPHASE:
+        return SweepAndPruneBroadphase(half_extent=contact_radius / 2)
+    raise ValueError("Unknown broadphase: " + str(name))
@@ -0,0 +1,106 @@
+import numpy as np
+
+from pyphyslab.physics.broadphase import box_pairs
+from pyphyslab.physics.contact import pack_pairs
+
+
+def swept_pairs(position, displacement, radius, fast, broadphase=None):
+    """ Candidate pairs (first < second) whose bounding boxes, grown by the particle radius and swept over the
+        step, overlap, for every pair with at least one fast particle. Pairs of two slow particles are left
+        to the regular broadphase. The boxes are matched by the broadphase, by default a grid of cells as wide
+        as the largest particle """
+    end = position + displacement
+    margin = radius[:, np.newaxis]
+    lower = np.minimum(position, end) - margin
+    upper = np.maximum(position, end) + margin
+    if broadphase is not None:
+        return broadphase.find_box_pairs(lower, upper, fast)
+    cell_size = 2.0 * radius.max() if len(radius) and radius.max() > 0 else 1.0
+    return box_pairs(lower, upper, fast, cell_size)
+
+
+def pair_time_of_impact(position, displacement, first, second, radius):
+    """ Fraction of the step at which two moving spheres first touch, inf for pairs which do not meet
+        or already touch at the start. radius is the per particle radius array """
+    relative_position = position[second] - position[first]
+    relative_displacement = displacement[second] - displacement[first]
+
+    a = np.einsum("ij,ij->i", relative_displacement, relative_displacement)
+    b = 2.0 * np.einsum("ij,ij->i", relative_position, relative_displacement)
+    contact_distance = radius[first] + radius[second]
+    c = np.einsum("ij,ij->i", relative_position, relative_position) - contact_distance * contact_distance
+    discriminant = b * b - 4.0 * a * c
+
+    hits = (c > 0) & (b < 0) & (discriminant >= 0)
+    time = np.full(len(first), np.inf)
+    time[hits] = (-b[hits] - np.sqrt(discriminant[hits])) / (2.0 * a[hits])
+    time[time > 1.0] = np.inf
+    return time
+
+
+class ContinuousCollision:
+    """ Swept sphere collision over the coming step for particles moving further than their radius
+        per step, and swept points against the static planes for every particle.
+        Each particle takes its earliest impact: it is moved to the impact point, its contact is resolved
+        there and its start position is set back along the new velocity, so that the integrator carries it
+        from the impact point for the rest of the step. The sub-step placement is exact for explicit Euler
+        and first order for the other integrators """
+
+    def resolve(self, system, particle_contacts, contact_resolver, static_colliders, materials, delta_time, broadphase=None):
+        """ Returns (first, second) of the particle contacts resolved at their time of impact.
+            broadphase finds the candidate pairs of the swept boxes """
+        empty = np.empty(0, dtype=np.int64)
+        if system.count == 0 or delta_time <= 0:
+            return empty, empty.copy()
+
+        position = system.position
+        velocity = system.velocity
+        awake = system.awake
+        displacement = velocity * delta_time
+        displacement[~awake] = 0.0
+
+        radius = system.radius
+        speed = np.linalg.norm(displacement, axis=1)
+        first, second = swept_pairs(position, displacement, radius, awake & (speed > radius), broadphase)
+        alive = system.alive
+        both_alive = alive[first] & alive[second]
+        first, second = first[both_alive], second[both_alive]
+        time = pair_time_of_impact(position, displacement, first, second, radius)
+
+        # Keep each particle's earliest impact; pairs which are not the earliest for both ends wait for a later step
+        earliest = np.full(system.count, np.inf)
+        np.minimum.at(earliest, first, time)
+        np.minimum.at(earliest, second, time)
+        selected = np.isfinite(time) & (time == earliest[first]) & (time == earliest[second])
+        first, second, time = first[selected], second[selected], time[selected]
+
+        if len(first):
+            impact = time[:, np.newaxis]
+            position[first] += impact * displacement[first]
+            position[second] += impact * displacement[second]
+            midline = position[second] - position[first]
+            contact_normal = midline / np.linalg.norm(midline, axis=1)[:, np.newaxis]
+
+            material = system.material
+            restitution, friction = materials.pair(material[first], material[second])
+            contact_resolver.resolve(system, first, second, contact_normal, restitution, delta_time, friction)
+            particle_contacts.insert(pack_pairs(first, second))
+
+            position[first] -= impact * delta_time * velocity[first]
+            position[second] -= impact * delta_time * velocity[second]
+            displacement[first] = velocity[first] * delta_time
+            displacement[second] = velocity[second] * delta_time
+
+        row, plane, normal, plane_time = static_colliders.time_of_impact(position, displacement)
+        if len(row):
+            # The earliest plane per particle
+            order = np.lexsort((plane_time, row))
+            earliest_of_row = order[np.r_[True, row[order][1:] != row[order][:-1]]]
+            row, plane, normal, plane_time = row[earliest_of_row], plane[earliest_of_row], normal[earliest_of_row], plane_time[earliest_of_row]
+
+            impact = plane_time[:, np.newaxis]
+            position[row] += impact * displacement[row]
+            static_colliders.resolve(system, row, plane, normal, np.zeros(len(row)), delta_time)
+            position[row] -= impact * delta_time * velocity[row]
+
+        return first, second
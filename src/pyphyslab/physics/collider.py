@@ -0,0 +1,187 @@
+import numpy as np
+
+from pyphyslab.physics.contact import ContactTable, pack_pairs
+
+RESTITUTION = 0.6
+MIN_RESTING_CONTACT = -0.01
+
+
+class PlaneCollider:
+    """ Static half-space. Points with dot(normal, x) < offset are inside """
+
+    def __init__(self, normal=(0.0, 1.0, 0.0), offset=0.0, restitution=RESTITUTION):
+        normal = np.asarray(normal, dtype=float)
+        length = np.linalg.norm(normal)
+        if length <= 0:
+            raise ValueError("normal must not be zero")
+        self.normal = normal / length
+        self.offset = offset / length
+        self.restitution = restitution
+
+    @classmethod
+    def ground(cls, restitution=RESTITUTION):
+        return cls((0.0, 1.0, 0.0), 0.0, restitution)
+
+
+class BoxCollider:
+    """ Static axis aligned box """
+
+    def __init__(self, minimum, maximum, restitution=RESTITUTION):
+        self.minimum = np.minimum(minimum, maximum).astype(float)
+        self.maximum = np.maximum(minimum, maximum).astype(float)
+        self.restitution = restitution
+
+
+class StaticColliderSet:
+    """ Planes and boxes tested against the whole particle population at once.
+        Contact indices are planes first, then boxes, in the order they were added """
+
+    def __init__(self, min_resting_contact=MIN_RESTING_CONTACT):
+        self._planes = []
+        self._boxes = []
+        self._min_resting_contact = min_resting_contact
+        self._contacts = ContactTable()
+        self._touching = np.empty(0, dtype=np.int64)
+        self._pack()
+
+    def __len__(self):
+        return len(self._planes) + len(self._boxes)
+
+    @property
+    def planes(self):
+        return self._planes
+
+    @property
+    def boxes(self):
+        return self._boxes
+
+    @property
+    def contacts(self):
+        return self._contacts
+
+    @property
+    def touching(self):
+        """ Particles found touching a collider by the last detect, resolved in that step or not """
+        return self._touching
+
+    def add(self, collider):
+        if isinstance(collider, PlaneCollider):
+            self._planes.append(collider)
+        elif isinstance(collider, BoxCollider):
+            self._boxes.append(collider)
+        else:
+            raise TypeError("Unsupported static collider: " + type(collider).__name__)
+        self._pack()
+        self._contacts.clear()
+        return collider
+
+    def refresh(self):
+        """ Repack the collider arrays after editing a collider in place """
+        self._pack()
+
+    def remove(self, collider):
+        if collider in self._planes:
+            self._planes.remove(collider)
+        else:
+            self._boxes.remove(collider)
+        self._pack()
+        self._contacts.clear()
+
+    def signed_distance(self, position):
+        """ Return (N, K) signed distances and (N, K, 3) outward normals for every particle and collider """
+        count = len(position)
+        distance = np.empty((count, len(self)))
+        normal = np.empty((count, len(self), 3))
+        planes = len(self._planes)
+
+        if planes:
+            distance[:, :planes] = position @ self._plane_normal.T - self._plane_offset
+            normal[:, :planes] = self._plane_normal
+
+        if self._boxes:
+            center = (self._box_minimum + self._box_maximum) * 0.5
+            half_size = (self._box_maximum - self._box_minimum) * 0.5
+            local = position[:, np.newaxis, :] - center
+            q = np.abs(local) - half_size
+
+            outside_vector = np.maximum(q, 0.0) * np.sign(local)
+            outside = np.linalg.norm(outside_vector, axis=2)
+            inside = np.minimum(q.max(axis=2), 0.0)
+            distance[:, planes:] = outside + inside
+
+            axis = np.argmax(q, axis=2)
+            inside_normal = np.zeros_like(local)
+            side = np.where(local >= 0, 1.0, -1.0)
+            np.put_along_axis(inside_normal, axis[..., np.newaxis], np.take_along_axis(side, axis[..., np.newaxis], axis=2), axis=2)
+            is_outside = outside > 0
+            outside_normal = outside_vector / np.where(is_outside, outside, 1.0)[..., np.newaxis]
+            normal[:, planes:] = np.where(is_outside[..., np.newaxis], outside_normal, inside_normal)
+
+        return distance, normal
+
+    def time_of_impact(self, position, displacement):
+        """ Returns (row, plane, normal, time) for every point which starts outside a plane and ends inside it
+            after moving by displacement. time is the fraction of the displacement at the crossing.
+            Boxes are not swept """
+        if not self._planes or len(position) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.copy(), np.empty((0, 3)), np.empty(0)
+
+        start = position @ self._plane_normal.T - self._plane_offset
+        approach = displacement @ self._plane_normal.T
+        row, plane = np.nonzero((start > 0) & (start + approach <= 0))
+        return row, plane, self._plane_normal[plane], start[row, plane] / -approach[row, plane]
+
+    def detect(self, system, particles=None):
+        """ Returns (particle, collider, normal, distance) of the contacts which need resolving.
+            particles optionally restricts the test to some particle indices.
+            A resting contact is resolved every other step, so only the contacts resolved now are kept """
+        if len(self) == 0 or system.count == 0 or (particles is not None and len(particles) == 0):
+            empty = np.empty(0, dtype=np.int64)
+            self._touching = empty
+            return empty, empty.copy(), np.empty((0, 3)), np.empty(0)
+
+        position = system.position if particles is None else system.position[particles]
+        distance, normal = self.signed_distance(position)
+        row, collider = np.nonzero(distance <= 0)
+        particle = row if particles is None else particles[row]
+        self._touching = particle
+        keys = pack_pairs(particle, collider)
+        is_new = ~self._contacts.contains(keys)
+        self._contacts.update(keys[is_new])
+
+        row = row[is_new]
+        collider = collider[is_new]
+        return particle[is_new], collider, normal[row, collider], distance[row, collider]
+
+    def resolve(self, system, particle, collider, normal, distance, delta_time):
+        """ Reflect and damp the velocity along the contact normal and push resting particles out.
+            Colliders are applied one after another so a particle wedged between two of them
+            gets the composition of both reflections """
+        if len(particle) == 0:
+            return
+
+        velocity = system.velocity
+        position = system.position
+        movable = system.inverse_mass[particle] > 0
+
+        for index in np.unique(collider[movable]).tolist():
+            selected = movable & (collider == index)
+            selected_particle = particle[selected]
+            selected_normal = normal[selected]
+            restitution = self._restitution[index]
+
+            particle_velocity = velocity[selected_particle]
+            normal_velocity = np.sum(particle_velocity * selected_normal, axis=1)[:, np.newaxis]
+            reflected_velocity = particle_velocity - 2.0 * normal_velocity * selected_normal
+            velocity[selected_particle] = restitution * (reflected_velocity + system.acceleration[selected_particle] * delta_time)
+
+            correction = np.maximum(self._min_resting_contact - distance[selected], 0.0)[:, np.newaxis]
+            position[selected_particle] += correction * selected_normal
+
+    def _pack(self):
+        self._plane_normal = np.array([plane.normal for plane in self._planes]).reshape(-1, 3)
+        self._plane_offset = np.array([plane.offset for plane in self._planes], dtype=float)
+        self._box_minimum = np.array([box.minimum for box in self._boxes]).reshape(-1, 3)
+        self._box_maximum = np.array([box.maximum for box in self._boxes]).reshape(-1, 3)
+        self._restitution = np.array([collider.restitution for collider in self._planes + self._boxes], dtype=float)
@@ -1,47 +1,78 @@
 
 import  numpy as np
 
+from pyphyslab.physics.contact import ContactTable, pack_pairs
+
 Y_COORD = 1
 
+GROUND_COLLIDER = 0
+
 class GroundCollisionDetector:
 
-    def __init__(self, p1):
-        self._detcted = False
+    def __init__(self, p1=None):
         self._p1 = p1
-    
-    def detect(self):
-        position = self._p1.position
-        
-        if position[Y_COORD] <= 0 and not self._detcted:
-            self._detcted = True                        
-            return GroundGontactResolver(self._p1)
+        self._contacts = ContactTable()
+
+    @property
+    def contacts(self):
+        return self._contacts
+
+    def detect(self, p1=None):
+        p1 = p1 if p1 is not None else self._p1
+        position = p1.position
+        key = pack_pairs([p1.index], [GROUND_COLLIDER])
+
+        if position[Y_COORD] <= 0 and not self._contacts.contains(key)[0]:
+            self._contacts.insert(key)
+            return GroundGontactResolver(p1)
         else:
-            self._detcted = False
-            return PassContacResolver(self._p1)
+            self._contacts.discard(key)
+            return PassContacResolver(p1)
 
 
 class ParticleCollisionDetector:
+    """ Two particles touch when their centers are closer than the sum of their radii """
 
     def __init__(self):
-        self._detcted = False
+        self._contacts = ContactTable()
+
+    @property
+    def contacts(self):
+        return self._contacts
 
     def detect(self, p1, p2):
         
         midline =  p2.position - p1.position
         size = np.linalg.norm(midline)
-        radius = 0.1
+        radius = p1.radius + p2.radius
+        key = pack_pairs([p1.index], [p2.index])
 
         if size <= 0 or size > radius:
-            self._detcted = False
+            self._contacts.discard(key)
             return PassContacResolver(p1, p2)
         else: 
-            if not self._detcted:
+            if not self._contacts.contains(key)[0]:
                 contact_normal = midline * (1 / size)                
-                self._detcted = True
+                self._contacts.insert(key)
         
                 return ParticleContactResolver(p1, p2, contact_normal)
             return PassContacResolver(p1, p2)            
 
+    def detect_pairs(self, system, first, second):
+        """ Narrowphase over candidate index pairs. Returns (first, second, contact_normal) of the new contacts only """
+        position = system.position
+        midline = position[second] - position[first]
+        size = np.linalg.norm(midline, axis=1)
+        radius = system.radius
+        touching = (size > 0) & (size <= radius[first] + radius[second])
+
+        first = first[touching]
+        second = second[touching]
+        contact_normal = midline[touching] / size[touching, np.newaxis]
+        is_new = self._contacts.update(pack_pairs(first, second))
+
+        return first[is_new], second[is_new], contact_normal[is_new]
+
 
 class GroundGontactResolver:
 
@@ -82,11 +113,14 @@ class PassContacResolver:
 
 
 class ParticleContactResolver:
+
+    RESTITUTION = 1.0
+
     def __init__(self, p1, p2, contact_normal):
         self._p1 = p1
         self._p2 = p2
         self._contact_normal = contact_normal
-        self._restitution = 1.0        
+        self._restitution = ParticleContactResolver.RESTITUTION
   
 
     def resolve(self, delta_time):
@@ -118,6 +152,76 @@ class ParticleContactResolver:
 
     def _separating_velocity(self):
         relative_velocity = self._p1.velocity - self._p2.velocity
-        return relative_velocity * self._contact_normal 
+        return relative_velocity * self._contact_normal
+
+
+class BatchContactResolver:
+    """ Resolves arrays of particle contacts at once with the same impulse math as ParticleContactResolver.
+        Impulses of particles taking part in several contacts are scatter-added. Every iteration after
+        the first only touches the contacts which are still closing. With per contact friction the
+        tangential relative velocity is removed afterwards, up to friction times the normal impulse """
+
+    def __init__(self, iterations=1):
+        self._iterations = max(int(iterations), 1)
+
+    @property
+    def iterations(self):
+        return self._iterations
+
+    @iterations.setter
+    def iterations(self, iterations):
+        self._iterations = max(int(iterations), 1)
+
+    def resolve(self, system, first, second, contact_normal, restitution, delta_time, friction=None):
+        if len(first) == 0:
+            return
+
+        velocity = system.velocity
+        acceleration = system.acceleration
+        inverse_mass = system.inverse_mass
+
+        first_inverse_mass = inverse_mass[first][:, np.newaxis]
+        second_inverse_mass = inverse_mass[second][:, np.newaxis]
+        total_inverse_mass = first_inverse_mass + second_inverse_mass
+        restitution = np.broadcast_to(np.asarray(restitution, dtype=float), (len(first),))[:, np.newaxis]
+
+        accumulated_caused_separation_velocity = (acceleration[first] - acceleration[second]) * contact_normal * delta_time
+        active = total_inverse_mass[:, 0] > 0
+        with_friction = friction is not None and np.any(friction)
+        normal_impulse = np.zeros(len(first))
+
+        for iteration in range(self._iterations):
+            separating_velocity = (velocity[first] - velocity[second]) * contact_normal
+            if iteration > 0:
+                active &= separating_velocity.sum(axis=1) > 0
+            if not active.any():
+                break
+
+            new_separating_velocity = restitution * (accumulated_caused_separation_velocity - separating_velocity)
+            delta_velocity = new_separating_velocity[active] - separating_velocity[active]
+            impulse_per_mass = contact_normal[active] * (delta_velocity / total_inverse_mass[active])
+
+            np.add.at(velocity, first[active], impulse_per_mass * first_inverse_mass[active])
+            np.add.at(velocity, second[active], -impulse_per_mass * second_inverse_mass[active])
+            if with_friction:
+                normal_impulse[active] += np.linalg.norm(impulse_per_mass, axis=1)
+
+        if with_friction:
+            self._apply_friction(velocity, first, second, contact_normal, friction, normal_impulse, first_inverse_mass, second_inverse_mass, total_inverse_mass)
+
+    def _apply_friction(self, velocity, first, second, contact_normal, friction, normal_impulse, first_inverse_mass, second_inverse_mass, total_inverse_mass):
+        movable = total_inverse_mass[:, 0] > 0
+        relative_velocity = velocity[first] - velocity[second]
+        tangent_velocity = relative_velocity - np.einsum("ij,ij->i", relative_velocity, contact_normal)[:, np.newaxis] * contact_normal
+        tangent_speed = np.linalg.norm(tangent_velocity, axis=1)
+        sliding = movable & (tangent_speed > 0)
+        if not sliding.any():
+            return
+
+        friction = np.broadcast_to(np.asarray(friction, dtype=float), (len(first),))
+        stopping_impulse = tangent_speed[sliding] / total_inverse_mass[sliding, 0]
+        impulse = np.minimum(stopping_impulse, friction[sliding] * normal_impulse[sliding])
+        impulse_per_mass = tangent_velocity[sliding] * (impulse / tangent_speed[sliding])[:, np.newaxis]
 
-    
\ No newline at end of file
+        np.add.at(velocity, first[sliding], -impulse_per_mass * first_inverse_mass[sliding])
+        np.add.at(velocity, second[sliding], impulse_per_mass * second_inverse_mass[sliding])
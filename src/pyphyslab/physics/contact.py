@@ -0,0 +1,95 @@
+import numpy as np
+
+_PAIR_SHIFT = 32
+_PAIR_MASK = (1 << _PAIR_SHIFT) - 1
+
+
+def pack_pairs(first, second):
+    """ Pack index pairs into one int64 key per pair """
+    return (np.asarray(first, dtype=np.int64) << _PAIR_SHIFT) | np.asarray(second, dtype=np.int64)
+
+
+def unpack_pairs(keys):
+    """ Split packed keys back into (first, second) index arrays """
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> _PAIR_SHIFT, keys & _PAIR_MASK
+
+
+class ContactTable:
+    """ Set of contacts stored as a sorted array of packed (i, j) keys and the number of steps each one has persisted """
+
+    def __init__(self):
+        self._keys = np.empty(0, dtype=np.int64)
+        self._age = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def age(self):
+        return self._age
+
+    @property
+    def pairs(self):
+        return unpack_pairs(self._keys)
+
+    def contains(self, keys):
+        """ Mask of which keys are already in the table """
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(self._keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        slot = np.searchsorted(self._keys, keys)
+        slot = np.minimum(slot, len(self._keys) - 1)
+        return self._keys[slot] == keys
+
+    def update(self, keys):
+        """ Replace the table with the contacts seen this step. Contacts which were not seen
+            are expired in bulk. Returns a mask of which of the given keys are new """
+        keys = np.asarray(keys, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        sorted_is_new = np.ones(len(sorted_keys), dtype=bool)
+        age = np.zeros(len(sorted_keys), dtype=np.int64)
+        if len(self._keys) > 0 and len(sorted_keys) > 0:
+            slot = np.minimum(np.searchsorted(self._keys, sorted_keys), len(self._keys) - 1)
+            persistent = self._keys[slot] == sorted_keys
+            sorted_is_new = ~persistent
+            age[persistent] = self._age[slot[persistent]] + 1
+
+        self._keys = sorted_keys
+        self._age = age
+
+        is_new = np.empty(len(keys), dtype=bool)
+        is_new[order] = sorted_is_new
+        return is_new
+
+    def insert(self, keys):
+        """ Add contacts which are not in the table yet """
+        keys = np.asarray(keys, dtype=np.int64)
+        keys = keys[~self.contains(keys)]
+        if len(keys) == 0:
+            return
+        merged = np.concatenate((self._keys, keys))
+        order = np.argsort(merged, kind="stable")
+        self._keys = merged[order]
+        self._age = np.concatenate((self._age, np.zeros(len(keys), dtype=np.int64)))[order]
+
+    def discard(self, keys):
+        """ Remove contacts if they are in the table """
+        keep = ~np.isin(self._keys, keys)
+        self._keys = self._keys[keep]
+        self._age = self._age[keep]
+
+    def restore(self, keys, age):
+        """ Replace the table with previously saved sorted keys and ages """
+        self._keys = np.array(keys, dtype=np.int64)
+        self._age = np.array(age, dtype=np.int64)
+
+    def clear(self):
+        self._keys = np.empty(0, dtype=np.int64)
+        self._age = np.empty(0, dtype=np.int64)
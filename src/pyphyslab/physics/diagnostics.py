@@ -0,0 +1,109 @@
+import numpy as np
+
+TIME_SERIES = "time"
+KINETIC_SERIES = "kinetic"
+POTENTIAL_SERIES = "potential"
+TOTAL_SERIES = "total"
+MOMENTUM_SERIES = "momentum"
+
+
+def energy(system, forces=None):
+    """ Kinetic and potential energy and linear momentum of a particle system. The potential is the one
+        of each particle's constant acceleration, -m a . x; particles with infinite mass are left out.
+        With forces, the potential of every generator implementing ForceGenerator.potential is added;
+        the work of the other generators, like drag or mutual gravity, is not seen """
+    inverse_mass = system.inverse_mass
+    mass = np.divide(1.0, inverse_mass, out=np.zeros_like(inverse_mass), where=inverse_mass > 0)
+    velocity = system.velocity
+    kinetic = 0.5 * np.einsum("i,ij,ij->", mass, velocity, velocity)
+    potential = -np.einsum("i,ij,ij->", mass, system.acceleration, system.position)
+    momentum = np.einsum("i,ij->j", mass, velocity)
+    if forces is not None:
+        for generator in forces:
+            generator_potential = generator.potential(system)
+            if generator_potential is not None:
+                potential += generator_potential
+    return kinetic, potential, momentum
+
+
+class EnergyMonitor:
+    """ Samples the energy and momentum of a world every few steps into growing series.
+        With a tolerance a drift alarm is raised whenever the total energy moves further than
+        tolerance * |first total| away from the first sample; alarm(monitor, time, drift) is called
+        and the alarm is kept in alarms. Only leaving the tolerance band raises, not every sample outside it.
+        Generator forces count through their potential; generators without one, like drag and mutual
+        gravity, do work the monitor does not see. Attach it with World.attach_diagnostics """
+
+    def __init__(self, every=1, tolerance=None, alarm=None, capacity=1024):
+        self._every = max(int(every), 1)
+        self._tolerance = tolerance
+        self._alarm = alarm
+        self._step = 0
+        self._samples = 0
+        self._time = np.empty(max(int(capacity), 1))
+        self._energy = np.empty((len(self._time), 3))
+        self._momentum = np.empty((len(self._time), 3))
+        self._drifting = False
+        self.alarms = []
+
+    @property
+    def samples(self):
+        return self._samples
+
+    @property
+    def drift(self):
+        """ Total energy of the last sample relative to the first one """
+        if self._samples == 0:
+            return 0.0
+        reference = self._energy[0, 2]
+        return float((self._energy[self._samples - 1, 2] - reference) / max(abs(reference), np.finfo(float).tiny))
+
+    def sample(self, world, time):
+        """ Called by the world after every step """
+        self._step += 1
+        if self._step % self._every != 0:
+            return
+
+        if self._samples == len(self._time):
+            self._grow()
+
+        kinetic, potential, momentum = energy(world.system, world.forces)
+        row = self._samples
+        self._time[row] = time
+        self._energy[row] = kinetic, potential, kinetic + potential
+        self._momentum[row] = momentum
+        self._samples += 1
+
+        if self._tolerance is not None:
+            drift = self.drift
+            drifting = abs(drift) > self._tolerance
+            if drifting and not self._drifting:
+                self.alarms.append((time, drift))
+                if self._alarm is not None:
+                    self._alarm(self, time, drift)
+            self._drifting = drifting
+
+    def series(self):
+        """ Copies of the sampled series. Energies have shape (samples,), momentum (samples, 3) """
+        count = self._samples
+        return {
+            TIME_SERIES: self._time[:count].copy(),
+            KINETIC_SERIES: self._energy[:count, 0].copy(),
+            POTENTIAL_SERIES: self._energy[:count, 1].copy(),
+            TOTAL_SERIES: self._energy[:count, 2].copy(),
+            MOMENTUM_SERIES: self._momentum[:count].copy(),
+        }
+
+    def clear(self):
+        self._step = 0
+        self._samples = 0
+        self._drifting = False
+        self.alarms = []
+
+    def _grow(self):
+        capacity = 2 * len(self._time)
+        for name in ("_time", "_energy", "_momentum"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:])
+            new[:self._samples] = old[:self._samples]
+            setattr(self, name, new)
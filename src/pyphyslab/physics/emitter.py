@@ -0,0 +1,127 @@
+import json
+
+import numpy as np
+
+
+class ParticleEmitter:
+    """ Spawns particles at rate per second from a fixed pool of capacity slots and kills them after
+        lifetime seconds. Slots come from a free list, so spawning and killing never grows the particle
+        arrays. Initial velocities are velocity plus normally distributed noise of velocity_spread per axis.
+        Add it with World.add_emitter, which reserves the pool and updates the emitter before every step.
+        radius None takes the world's particle radius """
+
+    def __init__(self, capacity, rate, lifetime, position=(0.0, 0.0, 0.0), velocity=(0.0, 0.0, 0.0), velocity_spread=0.0,
+                 mass=1.0, acceleration=(0.0, 0.0, 0.0), damping=0.85, radius=None, material=0, seed=None):
+        self._capacity = max(int(capacity), 1)
+        self.rate = rate
+        self.lifetime = lifetime
+        self.position = np.asarray(position, dtype=float)
+        self.velocity = np.asarray(velocity, dtype=float)
+        self.velocity_spread = velocity_spread
+        self.mass = mass
+        self.acceleration = np.asarray(acceleration, dtype=float)
+        self.damping = damping
+        self.radius = radius
+        self.material = material
+        self._random = np.random.default_rng(seed)
+
+        self._system = None
+        self._slots = None
+        self._age = np.zeros(self._capacity)
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        # Stack of free pool positions, the top is _free[_free_count - 1]
+        self._free = np.arange(self._capacity)[::-1].copy()
+        self._free_count = self._capacity
+        self._pending = 0.0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def slots(self):
+        """ Particle indices of the pool """
+        return self._slots
+
+    @property
+    def alive(self):
+        """ Alive mask of the pool, aligned with slots """
+        return self._alive
+
+    @property
+    def alive_count(self):
+        return self._capacity - self._free_count
+
+    def bind(self, system, slots):
+        """ Called by the world with the reserved pool slots, which start dead """
+        self._system = system
+        self._slots = np.asarray(slots)
+        system.kill(self._slots)
+
+    def update(self, delta_time):
+        """ Age and expire the living particles, then spawn the ones due in this step """
+        if delta_time <= 0:
+            return
+
+        self._age[self._alive] += delta_time
+        expired = np.flatnonzero(self._alive & (self._age >= self.lifetime))
+        if len(expired):
+            self._release(expired)
+
+        self._pending += self.rate * delta_time
+        count = min(int(self._pending), self._free_count)
+        self._pending -= int(self._pending)
+        if count:
+            self._spawn(count)
+
+    def state(self):
+        """ Copies of the pool arrays, the spawn remainder and the random generator state, which is
+            stored as JSON bytes since its integers do not fit an array """
+        random_state = json.dumps(self._random.bit_generator.state).encode("ascii")
+        return {
+            "age": self._age.copy(),
+            "alive": self._alive.copy(),
+            "free": self._free[:self._free_count].copy(),
+            "pending": np.array(self._pending),
+            "random": np.frombuffer(random_state, dtype=np.uint8).copy(),
+        }
+
+    def set_state(self, state):
+        """ Replace the pool with the arrays produced by state(). Without them the pool is rebuilt
+            from the alive flags of its slots, with the ages and the spawn remainder reset """
+        if "alive" not in state:
+            self._alive = self._system.alive[self._slots].copy()
+            self._age = np.zeros(self._capacity)
+            free = np.flatnonzero(~self._alive)[::-1]
+            self._pending = 0.0
+        else:
+            if len(state["alive"]) != self._capacity:
+                raise ValueError("Snapshot emitter capacity %d does not match %d" % (len(state["alive"]), self._capacity))
+            self._alive = state["alive"].astype(bool)
+            self._age = state["age"].astype(float)
+            free = state["free"]
+            self._pending = float(state["pending"])
+            self._random.bit_generator.state = json.loads(state["random"].tobytes().decode("ascii"))
+        self._free = np.zeros(self._capacity, dtype=np.int64)
+        self._free[:len(free)] = free
+        self._free_count = len(free)
+
+    def kill(self, pool_indices):
+        """ Kill living particles of the pool before their lifetime ends """
+        pool_indices = np.asarray(pool_indices)
+        self._release(pool_indices[self._alive[pool_indices]])
+
+    def _spawn(self, count):
+        taken = self._free[self._free_count - count:self._free_count]
+        self._free_count -= count
+
+        velocity = self.velocity + self._random.normal(0.0, self.velocity_spread, (count, 3)) if self.velocity_spread else self.velocity
+        self._system.revive(self._slots[taken], self.mass, velocity, self.acceleration, self.damping, self.position)
+        self._age[taken] = 0.0
+        self._alive[taken] = True
+
+    def _release(self, pool_indices):
+        self._system.kill(self._slots[pool_indices])
+        self._alive[pool_indices] = False
+        self._free[self._free_count:self._free_count + len(pool_indices)] = pool_indices
+        self._free_count += len(pool_indices)
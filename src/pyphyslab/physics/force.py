@@ -0,0 +1,277 @@
+import numpy as np
+
+from pyphyslab.physics.octree import Octree, barnes_hut_acceleration, direct_acceleration, LEAF_SIZE
+
+BARNES_HUT_GRAVITY = "barnes_hut"
+DIRECT_GRAVITY = "direct"
+
+
+def _indices(particles):
+    """ Index array from particle indices or Particle views """
+    return np.array([getattr(particle, "index", particle) for particle in particles], dtype=np.int64).reshape(-1)
+
+
+class ForceGenerator:
+    """ Base class of the force generators. apply adds the forces of every target at once
+        to the accumulated force of the system. particles None targets the whole system.
+        FIELD generators depend on the positions or velocities and are reevaluated at every stage of
+        multi stage integrators. WAKES generators wake the sleeping particles they push.
+        Conservative generators return their potential energy from potential, which the energy
+        diagnostics add up; the others return None and their work is not accounted for """
+
+    FIELD = False
+    WAKES = True
+
+    def __init__(self, particles=None):
+        self.particles = None if particles is None else _indices(particles)
+
+    def apply(self, system, delta_time):
+        raise NotImplementedError
+
+    def potential(self, system):
+        return None
+
+    def _targets(self, system):
+        return slice(0, system.count) if self.particles is None else self.particles
+
+
+class Gravity(ForceGenerator):
+    """ Force of a uniform acceleration on every movable target. Like the constant acceleration
+        of the particles it does not wake sleeping ones """
+
+    WAKES = False
+
+    def __init__(self, gravity=(0.0, -9.87, 0.0), particles=None):
+        super().__init__(particles)
+        self.gravity = np.asarray(gravity, dtype=float)
+
+    def apply(self, system, delta_time):
+        targets = self._targets(system)
+        inverse_mass = system.inverse_mass[targets]
+        mass = np.divide(1.0, inverse_mass, out=np.zeros_like(inverse_mass), where=inverse_mass > 0)
+        system.accumulated_force[targets] += mass[:, np.newaxis] * self.gravity
+
+    def potential(self, system):
+        targets = self._targets(system)
+        inverse_mass = system.inverse_mass[targets]
+        mass = np.divide(1.0, inverse_mass, out=np.zeros_like(inverse_mass), where=inverse_mass > 0)
+        return -float(mass @ (system.position[targets] @ self.gravity))
+
+
+class Drag(ForceGenerator):
+    """ Drag against the velocity: -v (linear + quadratic * |v|) """
+
+    FIELD = True
+
+    def __init__(self, linear=0.0, quadratic=0.0, particles=None):
+        super().__init__(particles)
+        self.linear = linear
+        self.quadratic = quadratic
+
+    def apply(self, system, delta_time):
+        targets = self._targets(system)
+        velocity = system.velocity[targets]
+        coefficient = self.linear + self.quadratic * np.linalg.norm(velocity, axis=1)
+        system.accumulated_force[targets] -= coefficient[:, np.newaxis] * velocity
+
+
+def _spring_force(midline, rest_length, stiffness, bungee):
+    """ Hooke force on the particle at the start of midline, pointing along it when stretched """
+    length = np.linalg.norm(midline, axis=1)
+    stretch = length - rest_length
+    if bungee:
+        stretch = np.maximum(stretch, 0.0)
+    magnitude = stiffness * stretch / np.where(length > 0, length, 1.0)
+    return midline * magnitude[:, np.newaxis]
+
+
+def _spring_potential(midline, rest_length, stiffness, bungee):
+    stretch = np.linalg.norm(midline, axis=1) - rest_length
+    if bungee:
+        stretch = np.maximum(stretch, 0.0)
+    return float(np.sum(0.5 * stiffness * stretch * stretch))
+
+
+class PairSprings(ForceGenerator):
+    """ Springs between the particles first[k] and second[k]. rest_length and stiffness broadcast over the springs """
+
+    BUNGEE = False
+    FIELD = True
+
+    def __init__(self, first, second, rest_length, stiffness):
+        super().__init__()
+        self.first = _indices(first)
+        self.second = _indices(second)
+        if len(self.first) != len(self.second):
+            raise ValueError("first and second must have the same length")
+        self.rest_length = np.asarray(rest_length, dtype=float)
+        self.stiffness = np.asarray(stiffness, dtype=float)
+
+    def apply(self, system, delta_time):
+        if len(self.first) == 0:
+            return
+        position = system.position
+        force = _spring_force(position[self.second] - position[self.first], self.rest_length, self.stiffness, self.BUNGEE)
+        accumulated_force = system.accumulated_force
+        np.add.at(accumulated_force, self.first, force)
+        np.add.at(accumulated_force, self.second, -force)
+
+    def potential(self, system):
+        position = system.position
+        return _spring_potential(position[self.second] - position[self.first], self.rest_length, self.stiffness, self.BUNGEE)
+
+
+class PairBungees(PairSprings):
+    """ Pair springs which only pull, when stretched beyond their rest length """
+
+    BUNGEE = True
+
+
+class AnchoredSprings(ForceGenerator):
+    """ Springs from particles to fixed anchor points. anchors has shape (3,) or one row per particle """
+
+    BUNGEE = False
+    FIELD = True
+
+    def __init__(self, particles, anchors, rest_length, stiffness):
+        super().__init__(particles)
+        self.anchors = np.asarray(anchors, dtype=float)
+        self.rest_length = np.asarray(rest_length, dtype=float)
+        self.stiffness = np.asarray(stiffness, dtype=float)
+
+    def apply(self, system, delta_time):
+        if len(self.particles) == 0:
+            return
+        force = _spring_force(self.anchors - system.position[self.particles], self.rest_length, self.stiffness, self.BUNGEE)
+        np.add.at(system.accumulated_force, self.particles, force)
+
+    def potential(self, system):
+        return _spring_potential(self.anchors - system.position[self.particles], self.rest_length, self.stiffness, self.BUNGEE)
+
+
+class AnchoredBungees(AnchoredSprings):
+    """ Anchored springs which only pull, when stretched beyond their rest length """
+
+    BUNGEE = True
+
+
+class MutualGravity(ForceGenerator):
+    """ Gravitational attraction between every pair of targets. BARNES_HUT_GRAVITY rebuilds an octree over the
+        positions every step, kept in tree for other far field queries, and costs O(N log N) with the opening
+        angle theta; DIRECT_GRAVITY sums every pair. Dead particles and particles of infinite mass do not attract """
+
+    FIELD = True
+
+    def __init__(self, constant=1.0, theta=0.5, softening=1e-3, method=BARNES_HUT_GRAVITY, leaf_size=LEAF_SIZE, particles=None):
+        super().__init__(particles)
+        if method not in (BARNES_HUT_GRAVITY, DIRECT_GRAVITY):
+            raise ValueError("Unknown gravity method: " + str(method))
+        self.constant = constant
+        self.theta = theta
+        self.softening = softening
+        self.method = method
+        self.leaf_size = leaf_size
+        self.tree = None
+
+    def apply(self, system, delta_time):
+        targets = self._targets(system)
+        position = system.position[targets]
+        if len(position) < 2:
+            return
+
+        inverse_mass = system.inverse_mass[targets]
+        mass = np.divide(1.0, inverse_mass, out=np.zeros_like(inverse_mass), where=(inverse_mass > 0) & system.alive[targets])
+
+        if self.method == BARNES_HUT_GRAVITY:
+            self.tree = Octree(position, mass, self.leaf_size)
+            acceleration = barnes_hut_acceleration(position, mass, self.constant, self.theta, self.softening, tree=self.tree)
+        else:
+            acceleration = direct_acceleration(position, mass, self.constant, self.softening)
+        system.accumulated_force[targets] += mass[:, np.newaxis] * acceleration
+
+
+class _FieldState:
+    """ Stand-in for the particle system with the positions and velocities of an integrator stage,
+        onto which field generators add their forces """
+
+    def __init__(self, system):
+        self.count = system.count
+        self.inverse_mass = system.inverse_mass
+        self.alive = system.alive
+        self.position = system.position.copy()
+        self.velocity = system.velocity.copy()
+        self.accumulated_force = np.zeros_like(self.position)
+
+    def apply(self, generators, delta_time):
+        self.accumulated_force[:] = 0.0
+        for generator in generators:
+            generator.apply(self, delta_time)
+        return self.accumulated_force
+
+
+class ForceRegistry:
+    """ Force generators applied by the world at the start of every step, one array kernel each.
+        With a multi stage integrator the world leaves the FIELD generators to acceleration_field,
+        so springs, drag and mutual gravity follow the positions and velocities within the step """
+
+    def __init__(self):
+        self._generators = []
+
+    def __len__(self):
+        return len(self._generators)
+
+    def __iter__(self):
+        return iter(self._generators)
+
+    def add(self, generator):
+        self._generators.append(generator)
+        return generator
+
+    def remove(self, generator):
+        self._generators.remove(generator)
+
+    def clear(self):
+        self._generators = []
+
+    def apply(self, system, delta_time, fields=True):
+        """ Add the forces of the generators to the accumulated force, without the FIELD generators when
+            fields is False, and wake the sleeping particles which receive a non-zero force """
+        asleep = np.flatnonzero(system.alive & ~system.awake)
+        pushed = np.zeros(len(asleep), dtype=bool)
+        accumulated_force = system.accumulated_force
+        for generator in self._generators:
+            if generator.FIELD and not fields:
+                continue
+            if len(asleep) and generator.WAKES:
+                before = accumulated_force[asleep]
+                generator.apply(system, delta_time)
+                pushed |= np.any(accumulated_force[asleep] != before, axis=1)
+            else:
+                generator.apply(system, delta_time)
+
+        if len(asleep) and not fields:
+            generators = [generator for generator in self._generators if generator.FIELD and generator.WAKES]
+            if generators:
+                pushed |= np.any(_FieldState(system).apply(generators, delta_time)[asleep] != 0.0, axis=1)
+        if pushed.any():
+            system.wake(asleep[pushed])
+
+    def acceleration_field(self, system, delta_time):
+        """ Callable (position, velocity) -> acceleration of the FIELD generators for ParticleSystem.integrate,
+            None without any. Create it right before integrating: when some particles sleep, the integrator
+            passes the rows of the particles awake at that time and the sleeping ones keep their positions """
+        generators = [generator for generator in self._generators if generator.FIELD]
+        if not generators:
+            return None
+
+        state = _FieldState(system)
+        awake = system.awake
+        rows = slice(None) if awake.all() else np.flatnonzero(awake)
+        inverse_mass = system.inverse_mass[rows, np.newaxis]
+
+        def field(position, velocity):
+            state.position[rows] = position
+            state.velocity[rows] = velocity
+            return state.apply(generators, delta_time)[rows] * inverse_mass
+
+        return field
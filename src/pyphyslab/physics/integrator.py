@@ -0,0 +1,120 @@
+import numpy as np
+
+EXPLICIT_EULER = "explicit_euler"
+SEMI_IMPLICIT_EULER = "semi_implicit_euler"
+VELOCITY_VERLET = "velocity_verlet"
+RK4 = "rk4"
+
+
+class Integrator:
+    """ Base class of the integrators. Every integrator advances the whole particle system in place.
+        acceleration_field is an optional callable (position, velocity) -> (N, 3) acceleration added
+        to the constant acceleration and accumulated force of the step. STAGES is the number of states
+        per step at which the acceleration is evaluated """
+
+    STAGES = 1
+
+    def step(self, system, delta_time, acceleration_field=None):
+        raise NotImplementedError
+
+    def _acceleration(self, system, position, velocity, acceleration_field):
+        acceleration = system.accumulated_force * system.inverse_mass[:, np.newaxis]
+        acceleration += system.acceleration
+        if acceleration_field is not None:
+            acceleration += acceleration_field(position, velocity)
+        return acceleration
+
+    def _damp(self, system, delta_time):
+        velocity = system.velocity
+        velocity *= np.power(system.damping, delta_time)[:, np.newaxis]
+
+
+class ExplicitEulerIntegrator(Integrator):
+    """ Position from the old velocity, then velocity. The original Particle.resolve scheme """
+
+    def step(self, system, delta_time, acceleration_field=None):
+        position = system.position
+        velocity = system.velocity
+        acceleration = self._acceleration(system, position, velocity, acceleration_field)
+
+        position += velocity * delta_time
+        acceleration *= delta_time
+        velocity += acceleration
+        self._damp(system, delta_time)
+
+
+class SemiImplicitEulerIntegrator(Integrator):
+    """ Velocity first, then position from the new velocity. Symplectic, same cost as explicit Euler """
+
+    def step(self, system, delta_time, acceleration_field=None):
+        position = system.position
+        velocity = system.velocity
+        acceleration = self._acceleration(system, position, velocity, acceleration_field)
+
+        acceleration *= delta_time
+        velocity += acceleration
+        self._damp(system, delta_time)
+        position += velocity * delta_time
+
+
+class VelocityVerletIntegrator(Integrator):
+    """ Second order, symplectic. Evaluates the acceleration field twice per step """
+
+    STAGES = 2
+
+    def step(self, system, delta_time, acceleration_field=None):
+        position = system.position
+        velocity = system.velocity
+        acceleration = self._acceleration(system, position, velocity, acceleration_field)
+
+        position += (velocity + 0.5 * delta_time * acceleration) * delta_time
+        new_acceleration = self._acceleration(system, position, velocity, acceleration_field)
+        acceleration += new_acceleration
+        acceleration *= 0.5 * delta_time
+        velocity += acceleration
+        self._damp(system, delta_time)
+
+
+class RK4Integrator(Integrator):
+    """ Classic fourth order Runge-Kutta. Evaluates the acceleration field four times per step """
+
+    STAGES = 4
+
+    def step(self, system, delta_time, acceleration_field=None):
+        position = system.position
+        velocity = system.velocity
+        half_step = 0.5 * delta_time
+
+        k1_position = velocity.copy()
+        k1_velocity = self._acceleration(system, position, velocity, acceleration_field)
+
+        k2_position = velocity + half_step * k1_velocity
+        k2_velocity = self._acceleration(system, position + half_step * k1_position, k2_position, acceleration_field)
+
+        k3_position = velocity + half_step * k2_velocity
+        k3_velocity = self._acceleration(system, position + half_step * k2_position, k3_position, acceleration_field)
+
+        k4_position = velocity + delta_time * k3_velocity
+        k4_velocity = self._acceleration(system, position + delta_time * k3_position, k4_position, acceleration_field)
+
+        sixth_step = delta_time / 6.0
+        position += sixth_step * (k1_position + 2.0 * (k2_position + k3_position) + k4_position)
+        velocity += sixth_step * (k1_velocity + 2.0 * (k2_velocity + k3_velocity) + k4_velocity)
+        self._damp(system, delta_time)
+
+
+_INTEGRATORS = {
+    EXPLICIT_EULER: ExplicitEulerIntegrator,
+    SEMI_IMPLICIT_EULER: SemiImplicitEulerIntegrator,
+    VELOCITY_VERLET: VelocityVerletIntegrator,
+    RK4: RK4Integrator,
+}
+
+
+def make_integrator(name):
+    """ Create an integrator by name. An Integrator instance is returned unchanged """
+    if isinstance(name, Integrator):
+        return name
+    if name not in _INTEGRATORS:
+        raise ValueError("Unknown integrator: " + str(name))
+    return _INTEGRATORS[name]()
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def find_islands(count, first, second):
+    """ Union-find over the contact pairs. Returns the island label of every particle,
+        which is the smallest particle index of its island """
+    labels = np.arange(count)
+    if len(first) == 0:
+        return labels
+
+    while True:
+        # Hook both ends of every contact onto the smaller root, then flatten the trees by pointer jumping
+        root = np.minimum(labels[first], labels[second])
+        previous = labels.copy()
+        np.minimum.at(labels, labels[first], root)
+        np.minimum.at(labels, labels[second], root)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def contact_islands(count, first, second):
+    """ Group contacts by island. Returns the contact order, which keeps contacts of one island
+        together and in their original order, and the start of every island in it """
+    labels = find_islands(count, first, second)
+    contact_labels = labels[first]
+    order = np.argsort(contact_labels, kind="stable")
+    sorted_labels = contact_labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+    return order, starts
+
+
+class IslandContactSolver:
+    """ Resolves independent contact islands on a thread pool. Islands share no particles, so every
+        island sees the same impulses in the same order as in a serial solve and the result does not
+        depend on the worker count. Islands are packed into chunks of about min_chunk_contacts contacts
+        because tiny tasks cost more to dispatch than to solve.
+        The workers give a deterministic partitioning, not throughput: the resolver's np.add.at and fancy
+        indexing on island sized arrays hold the GIL, so the chunks run one after another. Over 60 steps of
+        20k particles in 628 islands the solve took 0.09 s with one worker and 0.14 to 0.17 s with two or four """
+
+    def __init__(self, resolver, workers=1, min_chunk_contacts=256):
+        self._resolver = resolver
+        self._workers = max(int(workers), 1)
+        self._min_chunk_contacts = max(int(min_chunk_contacts), 1)
+        self._executor = None
+        self._island_count = None
+
+    @property
+    def resolver(self):
+        return self._resolver
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def island_count(self):
+        """ Number of contact islands of the last resolve. None when the contacts were solved serially """
+        return self._island_count
+
+    def resolve(self, system, first, second, contact_normal, restitution, delta_time, friction=None):
+        if self._workers == 1 or len(first) == 0:
+            self._island_count = None
+            self._resolver.resolve(system, first, second, contact_normal, restitution, delta_time, friction)
+            return
+
+        order, starts = contact_islands(system.count, first, second)
+        self._island_count = len(starts)
+
+        chunks = self._chunks(order, starts)
+        if len(chunks) < 2:
+            self._resolver.resolve(system, first, second, contact_normal, restitution, delta_time, friction)
+            return
+
+        restitution = np.broadcast_to(np.asarray(restitution, dtype=float), (len(first),))
+        friction = np.broadcast_to(np.asarray(0.0 if friction is None else friction, dtype=float), (len(first),))
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        futures = [
+            self._executor.submit(self._resolver.resolve, system, first[chunk], second[chunk], contact_normal[chunk], restitution[chunk], delta_time, friction[chunk])
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _chunks(self, order, starts):
+        if len(starts) < 2:
+            return [order]
+
+        # Cut only at island starts, aiming for a few chunks per worker
+        target = max(len(order) // (4 * self._workers), self._min_chunk_contacts)
+        bucket = starts // target
+        cuts = np.r_[starts[np.r_[True, bucket[1:] != bucket[:-1]]], len(order)]
+        return [order[begin:end] for begin, end in zip(cuts[:-1], cuts[1:])]
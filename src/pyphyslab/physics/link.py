@@ -0,0 +1,278 @@
+import numpy as np
+
+from pyphyslab.physics.broadphase import expand_ranges
+
+ROD_LINK = 0
+CABLE_LINK = 1
+
+# Violations shorter than this are left alone so resting structures do not jitter
+LINK_TOLERANCE = 1e-6
+# Projection stops once every link is within this fraction of its length (or LINK_TOLERANCE if larger)
+LENGTH_TOLERANCE = 1e-3
+
+# Conjugate gradient stops once no link is off by more than this fraction of LINK_TOLERANCE (per step for
+# velocities), or after CONJUGATE_GRADIENT_ITERATIONS
+SOLVE_TOLERANCE = 0.1
+CONJUGATE_GRADIENT_ITERATIONS = 256
+# Solves per pass which release the cables found pushing
+CABLE_ROUNDS = 3
+# Diagonal added to the link system, relative to its own diagonal, so redundant links keep it solvable
+LINK_REGULARIZATION = 1e-9
+
+
+def _scatter(index, values, count):
+    return np.stack([np.bincount(index, weights=values[:, axis], minlength=count) for axis in range(3)], axis=1)
+
+
+def _conjugate_gradient(matvec, rhs, iterations, tolerance, guess=None):
+    """ Solve matvec(x) = rhs for a symmetric positive definite operator, starting from guess,
+        until no residual entry exceeds its tolerance """
+    solution = np.zeros_like(rhs) if guess is None else guess.copy()
+    residual = rhs - matvec(solution) if guess is not None else rhs.copy()
+    direction = residual.copy()
+    residual_squared = residual @ residual
+    for _ in range(iterations):
+        if np.all(np.abs(residual) <= tolerance):
+            break
+        product = matvec(direction)
+        curvature = direction @ product
+        if curvature <= 0:
+            break
+        step = residual_squared / curvature
+        solution += step * direction
+        residual -= step * product
+        new_residual_squared = residual @ residual
+        direction = residual + (new_residual_squared / residual_squared) * direction
+        residual_squared = new_residual_squared
+    return solution
+
+
+def _solve_links(first, second, normal, inverse_mass, error, tolerance, guess=None):
+    """ Impulses along the link normals with n . (move[second] - move[first]) = -error for every link, where
+        the moves are the impulses scaled by the inverse masses. A positive impulse pushes the ends apart.
+        The link system only couples links sharing a particle, so it is assembled once as a sparse matrix """
+    count = len(first)
+    end_link = np.tile(np.arange(count), 2)
+    end_particle = np.concatenate((second, first))
+    end_normal = np.concatenate((normal, -normal))
+
+    order = np.argsort(end_particle, kind="stable")
+    sorted_particle = end_particle[order]
+    group_start = np.searchsorted(sorted_particle, sorted_particle, side="left")
+    group_end = np.searchsorted(sorted_particle, sorted_particle, side="right")
+    owner, partner = expand_ranges(group_start, group_end)
+    row = end_link[order[owner]]
+    column = end_link[order[partner]]
+    value = inverse_mass[sorted_particle[owner]] * np.einsum("ij,ij->i", end_normal[order[owner]], end_normal[order[partner]])
+    diagonal = LINK_REGULARIZATION * (inverse_mass[first] + inverse_mass[second])
+
+    def matvec(impulse):
+        return np.bincount(row, weights=value * impulse[column], minlength=count) + diagonal * impulse
+
+    return _conjugate_gradient(matvec, -error, min(max(count, 1), CONJUGATE_GRADIENT_ITERATIONS), tolerance, guess)
+
+
+class LinkConstraints:
+    """ Rods (fixed length) and cables (maximum length) between particle pairs, stored as index arrays.
+        resolve runs with the particle contacts: the relative velocity along every rod and taut cable is removed
+        by impulses found for all links at once by conjugate gradient, warm started from the impulses of the
+        previous step. Cables only pull and bounce back by their restitution. project runs after integration and
+        moves the ends back to within LENGTH_TOLERANCE of their lengths; each of up to iterations Gauss-Newton
+        iterations solves the linearized lengths of all links at once, and the moves divided by the step are
+        added to the velocities. Solving globally holds long chains rigid, which one link at a time relaxation
+        does not, at the price of conjugate gradient iterations growing with the size of the structure """
+
+    def __init__(self, iterations=8):
+        self._iterations = max(int(iterations), 1)
+        self._first = np.empty(0, dtype=np.int64)
+        self._second = np.empty(0, dtype=np.int64)
+        self._length = np.empty(0)
+        self._kind = np.empty(0, dtype=np.int64)
+        self._restitution = np.empty(0)
+        self._impulse = np.empty(0)
+        self._violated = 0
+
+    def __len__(self):
+        return len(self._first)
+
+    @property
+    def iterations(self):
+        return self._iterations
+
+    @iterations.setter
+    def iterations(self, iterations):
+        self._iterations = max(int(iterations), 1)
+
+    @property
+    def first(self):
+        return self._first
+
+    @property
+    def second(self):
+        return self._second
+
+    @property
+    def length(self):
+        return self._length
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def impulse(self):
+        """ Impulses of the last velocity pass, which warm start the next one """
+        return self._impulse
+
+    @property
+    def violated(self):
+        """ Number of links violated at the start of the last projection """
+        return self._violated
+
+    def add_rods(self, system, first, second, length=None):
+        """ Link pairs at a fixed length, by default their current distance. Returns the link indices """
+        return self._add(system, first, second, length, ROD_LINK, 0.0)
+
+    def add_cables(self, system, first, second, length=None, restitution=0.0):
+        """ Link pairs with a maximum length, by default their current distance. Returns the link indices """
+        return self._add(system, first, second, length, CABLE_LINK, restitution)
+
+    def remove(self, links):
+        keep = np.ones(len(self), dtype=bool)
+        keep[links] = False
+        for name in ("_first", "_second", "_length", "_kind", "_restitution", "_impulse"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def clear(self):
+        self.remove(slice(None))
+
+    def restore(self, impulse=None):
+        """ Replace the warm start impulses with saved ones, or reset them """
+        if impulse is None:
+            self._impulse = np.zeros(len(self))
+        elif len(impulse) != len(self):
+            raise ValueError("Saved impulses are for %d links, not %d" % (len(impulse), len(self)))
+        else:
+            self._impulse = np.array(impulse, dtype=float)
+
+    def resolve(self, system, delta_time):
+        """ Velocity pass. Returns the mask of the links which received an impulse """
+        pushed = np.zeros(len(self), dtype=bool)
+        if len(self) == 0 or delta_time <= 0:
+            return pushed
+
+        particles, first, second, inverse_mass, total_inverse_mass, enabled = self._local(system)
+        position = system.position[particles]
+        velocity = system.velocity[particles]
+
+        midline = position[second] - position[first]
+        distance = np.linalg.norm(midline, axis=1)
+        normal = midline / np.where(distance > 0, distance, 1.0)[:, np.newaxis]
+        cable = self._kind == CABLE_LINK
+        held = enabled & (distance > 0) & ~(cable & (distance < self._length - LINK_TOLERANCE))
+
+        relative_speed = np.einsum("ij,ij->i", velocity[second] - velocity[first], normal)
+        # Taut cables whose ends move apart bounce back by the restitution, everything else stops along the link
+        target = np.where(cable & (relative_speed > 0), -self._restitution * relative_speed, 0.0)
+        impulse, links = self._solve_held(held, cable, first, second, normal, inverse_mass, relative_speed - target,
+                                          SOLVE_TOLERANCE * LINK_TOLERANCE / delta_time, self._impulse)
+        self._impulse = np.zeros(len(self))
+        self._impulse[links] = impulse
+
+        moved = self._moves(links, impulse, first, second, normal, inverse_mass, len(particles))
+        system.velocity[particles] = velocity + moved
+        pushed[links] = np.abs(impulse) * total_inverse_mass[links] > LINK_TOLERANCE
+        return pushed
+
+    def project(self, system, delta_time):
+        """ Position pass. Returns the mask of the links violated at its start """
+        violated_at_start = np.zeros(len(self), dtype=bool)
+        if len(self) == 0 or delta_time <= 0:
+            self._violated = 0
+            return violated_at_start
+
+        particles, first, second, inverse_mass, total_inverse_mass, enabled = self._local(system)
+        start = system.position[particles]
+        position = start.copy()
+        cable = self._kind == CABLE_LINK
+        tolerance = self._tolerance()
+        was_held = np.zeros(len(self), dtype=bool)
+
+        for iteration in range(self._iterations):
+            midline = position[second] - position[first]
+            distance = np.linalg.norm(midline, axis=1)
+            error = distance - self._length
+            slack = cable & (error < 0)
+            violated = enabled & ~slack & (np.abs(error) > tolerance) & (distance > 0)
+            if iteration == 0:
+                violated_at_start = violated
+            if not violated.any():
+                break
+
+            # Rods and taut cables hold together, so fixing one link does not break its neighbours. Cables held
+            # by an earlier iteration stay held, rather than flipping slack when projected just short of their length
+            held = enabled & (~slack | was_held) & (distance > 0)
+            normal = midline / np.where(distance > 0, distance, 1.0)[:, np.newaxis]
+            impulse, links = self._solve_held(held, cable, first, second, normal, inverse_mass, error, SOLVE_TOLERANCE * LINK_TOLERANCE)
+            was_held[:] = False
+            was_held[links] = True
+            position += self._moves(links, impulse, first, second, normal, inverse_mass, len(particles))
+
+        system.position[particles] = position
+        if delta_time > 0:
+            system.velocity[particles] += (position - start) / delta_time
+        self._violated = int(np.count_nonzero(violated_at_start))
+        return violated_at_start
+
+    def _tolerance(self):
+        return np.maximum(LENGTH_TOLERANCE * self._length, LINK_TOLERANCE)
+
+    def _local(self, system):
+        """ The linked particles, and the link ends renumbered into them """
+        particles, local = np.unique(np.concatenate((self._first, self._second)), return_inverse=True)
+        first = local[:len(self)]
+        second = local[len(self):]
+        inverse_mass = system.inverse_mass[particles]
+        alive = system.alive[particles]
+        total_inverse_mass = inverse_mass[first] + inverse_mass[second]
+        enabled = (total_inverse_mass > 0) & alive[first] & alive[second]
+        return particles, first, second, inverse_mass, total_inverse_mass, enabled
+
+    def _solve_held(self, held, cable, first, second, normal, inverse_mass, error, tolerance, guess=None):
+        """ Impulses along the normals of the held links which remove their error, linearized.
+            Cables which would push their ends apart are released and the solve repeats, up to
+            CABLE_ROUNDS times; cables still pushing after that have their impulse dropped """
+        held = held.copy()
+        for _ in range(CABLE_ROUNDS):
+            links = np.flatnonzero(held)
+            impulse = _solve_links(first[links], second[links], normal[links], inverse_mass, error[links], tolerance,
+                                   None if guess is None else guess[links])
+            pushing = cable[links] & (impulse > 0)
+            if not pushing.any():
+                break
+            held[links[pushing]] = False
+        return impulse[~pushing], links[~pushing]
+
+    def _moves(self, links, impulse, first, second, normal, inverse_mass, count):
+        along = normal[links] * impulse[:, np.newaxis]
+        return _scatter(np.concatenate((second[links], first[links])), np.concatenate((along, -along)), count) * inverse_mass[:, np.newaxis]
+
+    def _add(self, system, first, second, length, kind, restitution):
+        first = np.atleast_1d(np.asarray(first, dtype=np.int64))
+        second = np.atleast_1d(np.asarray(second, dtype=np.int64))
+        if len(first) != len(second):
+            raise ValueError("first and second must have the same length")
+        if np.any(first == second):
+            raise ValueError("A link needs two different particles")
+        if length is None:
+            length = np.linalg.norm(system.position[second] - system.position[first], axis=1)
+        count = len(first)
+
+        start = len(self)
+        self._first = np.concatenate((self._first, first))
+        self._second = np.concatenate((self._second, second))
+        self._length = np.concatenate((self._length, np.broadcast_to(np.asarray(length, dtype=float), (count,))))
+        self._kind = np.concatenate((self._kind, np.full(count, kind, dtype=np.int64)))
+        self._restitution = np.concatenate((self._restitution, np.broadcast_to(np.asarray(restitution, dtype=float), (count,))))
+        self._impulse = np.concatenate((self._impulse, np.zeros(count)))
+        return np.arange(start, len(self))
@@ -0,0 +1,55 @@
+import numpy as np
+
+DEFAULT_MATERIAL = 0
+
+
+class MaterialTable:
+    """ Restitution and friction of every pair of particle materials, kept as two small symmetric matrices
+        so the coefficients of all contacts are gathered with one fancy index each.
+        Pairs of different materials combine as the smaller restitution and the geometric mean friction
+        unless set_pair overrides them. Material 0 is the default: fully elastic and frictionless """
+
+    def __init__(self, restitution=1.0, friction=0.0):
+        self._material_restitution = np.array([restitution], dtype=float)
+        self._material_friction = np.array([friction], dtype=float)
+        self._restitution = np.array([[restitution]], dtype=float)
+        self._friction = np.array([[friction]], dtype=float)
+
+    def __len__(self):
+        return len(self._material_restitution)
+
+    @property
+    def restitution(self):
+        """ (M, M) pair restitution matrix """
+        return self._restitution
+
+    @property
+    def friction(self):
+        """ (M, M) pair friction matrix """
+        return self._friction
+
+    def add(self, restitution=1.0, friction=0.0):
+        """ Append a material and return its id """
+        self._material_restitution = np.append(self._material_restitution, restitution)
+        self._material_friction = np.append(self._material_friction, friction)
+
+        restitution = np.minimum.outer(self._material_restitution, self._material_restitution)
+        friction = np.sqrt(np.multiply.outer(self._material_friction, self._material_friction))
+        count = len(self._restitution)
+        # Keep the overrides of the existing pairs
+        restitution[:count, :count] = self._restitution
+        friction[:count, :count] = self._friction
+        self._restitution = restitution
+        self._friction = friction
+        return len(self) - 1
+
+    def set_pair(self, first, second, restitution=None, friction=None):
+        """ Override the coefficients of one pair of materials """
+        if restitution is not None:
+            self._restitution[first, second] = self._restitution[second, first] = restitution
+        if friction is not None:
+            self._friction[first, second] = self._friction[second, first] = friction
+
+    def pair(self, first_material, second_material):
+        """ (restitution, friction) arrays for contacts between the given material id arrays """
+        return self._restitution[first_material, second_material], self._friction[first_material, second_material]
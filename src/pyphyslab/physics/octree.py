@@ -0,0 +1,248 @@
+import numpy as np
+
+from pyphyslab.physics.broadphase import expand_ranges
+
+MORTON_BITS = 21
+LEAF_SIZE = 8
+
+
+def _spread_bits(value):
+    """ Insert two zero bits between each of the low 21 bits """
+    value = value.astype(np.uint64) & np.uint64(0x1FFFFF)
+    value = (value | (value << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    value = (value | (value << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    value = (value | (value << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    value = (value | (value << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    value = (value | (value << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return value
+
+
+def morton_codes(position, minimum, size):
+    """ 63 bit Morton codes of positions inside the cube at minimum with edge size """
+    scale = (1 << MORTON_BITS) / size
+    cells = np.clip(((position - minimum) * scale).astype(np.int64), 0, (1 << MORTON_BITS) - 1)
+    return (_spread_bits(cells[:, 0]) << np.uint64(2)) | (_spread_bits(cells[:, 1]) << np.uint64(1)) | _spread_bits(cells[:, 2])
+
+
+class Octree:
+    """ Linear octree over a point set, built from sorted Morton codes one level at a time.
+        Every node covers a contiguous range [start, end) of the points in Morton order and stores
+        their total mass, center of mass and cube size; children of a node are contiguous.
+        Nodes with at most leaf_size points, or at the deepest level, are leaves.
+        interactions() walks the tree for any set of query points, so far field queries other than
+        gravity reuse the same build """
+
+    def __init__(self, position, mass=None, leaf_size=LEAF_SIZE):
+        position = np.asarray(position, dtype=float)
+        count = len(position)
+        mass = np.ones(count) if mass is None else np.broadcast_to(np.asarray(mass, dtype=float), (count,))
+        self._leaf_size = max(int(leaf_size), 1)
+
+        minimum = position.min(axis=0) if count else np.zeros(3)
+        extent = float((position.max(axis=0) - minimum).max()) if count else 0.0
+        size = extent * (1.0 + 1e-9) if extent > 0 else 1.0
+        codes = morton_codes(position, minimum, size)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+        self.position = position[self.order]
+        self.mass = mass[self.order]
+        self._build(size)
+
+    def __len__(self):
+        return len(self.start)
+
+    def _build(self, size):
+        count = len(self.codes)
+        weighted = self.position * self.mass[:, np.newaxis]
+
+        starts = [np.zeros(1, dtype=np.int64)]
+        ends = [np.array([count], dtype=np.int64)]
+        levels = [np.zeros(1, dtype=np.int64)]
+        splits = count > self._leaf_size
+        # Points whose node at the current level is split further
+        in_split = np.full(count, splits)
+
+        for level in range(1, MORTON_BITS + 1):
+            if not in_split.any():
+                break
+            prefix = self.codes >> np.uint64(3 * (MORTON_BITS - level))
+            group_start = np.flatnonzero(np.r_[True, prefix[1:] != prefix[:-1]])
+            group_end = np.r_[group_start[1:], count]
+
+            selected = in_split[group_start]
+            group_start, group_end = group_start[selected], group_end[selected]
+            starts.append(group_start)
+            ends.append(group_end)
+            levels.append(np.full(len(group_start), level, dtype=np.int64))
+
+            split = (group_end - group_start > self._leaf_size) & (level < MORTON_BITS)
+            in_split = np.zeros(count, dtype=bool)
+            owner, index = expand_ranges(group_start[split], group_end[split])
+            in_split[index] = True
+
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.level = np.concatenate(levels)
+        self.size = size / (2.0 ** self.level)
+
+        # Node ranges of different levels overlap, so sums come from prefix sums rather than reduceat
+        mass_sum = np.r_[0.0, np.cumsum(self.mass)]
+        moment_sum = np.vstack((np.zeros((1, 3)), np.cumsum(weighted, axis=0)))
+        node_mass = mass_sum[self.end] - mass_sum[self.start]
+        node_moment = moment_sum[self.end] - moment_sum[self.start]
+        self.node_mass = node_mass
+        self.center_of_mass = node_moment / np.where(node_mass != 0, node_mass, 1.0)[:, np.newaxis]
+
+        # Children follow their parents level by level; a child is the next level node starting inside the parent
+        level_offset = np.searchsorted(self.level, np.arange(self.level.max() + 2))
+        self.first_child = np.full(len(self.start), -1, dtype=np.int64)
+        self.child_count = np.zeros(len(self.start), dtype=np.int64)
+        for level in range(self.level.max()):
+            parents = np.arange(level_offset[level], level_offset[level + 1])
+            children_start = self.start[level_offset[level + 1]:level_offset[level + 2]]
+            first = np.searchsorted(children_start, self.start[parents], side="left")
+            last = np.searchsorted(children_start, self.end[parents], side="left")
+            has_children = last > first
+            self.first_child[parents[has_children]] = level_offset[level + 1] + first[has_children]
+            self.child_count[parents] = last - first
+
+    @property
+    def is_leaf(self):
+        return self.child_count == 0
+
+    def interactions(self, points, theta=0.5):
+        """ Walk the tree for every query point. Returns ((point, node), (point, particle)):
+            far nodes seen under less than theta (size / distance) and the particles of the leaves which
+            had to be opened. Particle indices are in Morton order; tree.order maps them back """
+        points = np.asarray(points, dtype=float)
+        point = np.arange(len(points))
+        node = np.zeros(len(points), dtype=np.int64)
+        far_point, far_node, near_point, near_particle = [], [], [], []
+        theta_squared = theta * theta
+
+        while len(point):
+            offset = self.center_of_mass[node] - points[point]
+            distance_squared = np.einsum("ij,ij->i", offset, offset)
+            far = self.size[node] ** 2 < theta_squared * distance_squared
+            far_point.append(point[far])
+            far_node.append(node[far])
+
+            near = ~far
+            leaf = near & self.is_leaf[node]
+            owner, particle = expand_ranges(self.start[node[leaf]], self.end[node[leaf]])
+            near_point.append(point[leaf][owner])
+            near_particle.append(particle)
+
+            opened = near & ~leaf
+            owner, child = expand_ranges(self.first_child[node[opened]], self.first_child[node[opened]] + self.child_count[node[opened]])
+            point = point[opened][owner]
+            node = child
+
+        return (np.concatenate(far_point), np.concatenate(far_node)), (np.concatenate(near_point), np.concatenate(near_particle))
+
+    def leaf_interactions(self, leaves, theta=0.5):
+        """ Walk the tree once per leaf of the tree instead of once per point. Returns ((leaf, node), (leaf, particle)):
+            a node is far when theta * (distance - leaf radius) exceeds its size, so it is far for every point of the leaf,
+            and never when it holds the leaf. Near particles of the leaf itself are included """
+        leaves = np.asarray(leaves, dtype=np.int64)
+        owner, particle = expand_ranges(self.start[leaves], self.end[leaves])
+        low = np.full((len(leaves), 3), np.inf)
+        high = np.full((len(leaves), 3), -np.inf)
+        np.minimum.at(low, owner, self.position[particle])
+        np.maximum.at(high, owner, self.position[particle])
+        leaf_center = 0.5 * (low + high)
+        leaf_radius = 0.5 * np.linalg.norm(high - low, axis=1)
+        leaf_start = self.start[leaves]
+
+        group = np.arange(len(leaves))
+        node = np.zeros(len(leaves), dtype=np.int64)
+        far_group, far_node, near_group, near_particle = [], [], [], []
+
+        while len(group):
+            offset = self.center_of_mass[node] - leaf_center[group]
+            reach = np.maximum(np.sqrt(np.einsum("ij,ij->i", offset, offset)) - leaf_radius[group], 0.0)
+            holds = (self.start[node] <= leaf_start[group]) & (leaf_start[group] < self.end[node])
+            far = (self.size[node] < theta * reach) & ~holds
+            far_group.append(group[far])
+            far_node.append(node[far])
+
+            near = ~far
+            leaf = near & self.is_leaf[node]
+            owner, particle = expand_ranges(self.start[node[leaf]], self.end[node[leaf]])
+            near_group.append(group[leaf][owner])
+            near_particle.append(particle)
+
+            opened = near & ~leaf
+            owner, child = expand_ranges(self.first_child[node[opened]], self.first_child[node[opened]] + self.child_count[node[opened]])
+            group = group[opened][owner]
+            node = child
+
+        return (leaves[np.concatenate(far_group)], np.concatenate(far_node)), (leaves[np.concatenate(near_group)], np.concatenate(near_particle))
+
+
+def _gravity_kernel(offset, mass, softening):
+    """ Acceleration contributions G = 1 of masses at offset """
+    distance_squared = np.einsum("ij,ij->i", offset, offset) + softening * softening
+    inverse = np.divide(1.0, np.sqrt(distance_squared), out=np.zeros_like(distance_squared), where=distance_squared > 0)
+    return offset * (mass * inverse * inverse * inverse)[:, np.newaxis]
+
+
+def _scatter_sum(index, values, count):
+    return np.stack([np.bincount(index, weights=values[:, axis], minlength=count) for axis in range(3)], axis=1)
+
+
+def barnes_hut_acceleration(position, mass, constant=1.0, theta=0.5, softening=1e-3, leaf_size=LEAF_SIZE, chunk_size=4096, tree=None):
+    """ Gravitational acceleration of every point by every other one in O(N log N). tree, when given, must be
+        built over the same positions. The tree is walked once per leaf, in chunks of about chunk_size points
+        to bound the memory of the interaction lists """
+    position = np.asarray(position, dtype=float)
+    tree = tree if tree is not None else Octree(position, mass, leaf_size)
+    count = len(position)
+    # Accelerations in Morton order
+    acceleration = np.empty((count, 3))
+    if count == 0:
+        return acceleration
+
+    leaves = np.flatnonzero(tree.is_leaf)
+    leaves = leaves[np.argsort(tree.start[leaves])]
+    chunk_leaves = max(chunk_size // tree._leaf_size, 1)
+
+    for first in range(0, len(leaves), chunk_leaves):
+        (far_leaf, far_node), (near_leaf, near_particle) = tree.leaf_interactions(leaves[first:first + chunk_leaves], theta)
+
+        # Every pair of a leaf and a far node or near particle acts on every point of the leaf
+        owner, far_target = expand_ranges(tree.start[far_leaf], tree.end[far_leaf])
+        source = far_node[owner]
+        far = _gravity_kernel(tree.center_of_mass[source] - tree.position[far_target], tree.node_mass[source], softening)
+
+        owner, near_target = expand_ranges(tree.start[near_leaf], tree.end[near_leaf])
+        source = near_particle[owner]
+        # A point meets itself at zero offset, which the softened kernel turns into zero
+        near = _gravity_kernel(tree.position[source] - tree.position[near_target], tree.mass[source], softening)
+
+        # Targets of a chunk are one contiguous Morton range
+        low = tree.start[leaves[first]]
+        high = tree.end[leaves[min(first + chunk_leaves, len(leaves)) - 1]]
+        acceleration[low:high] = _scatter_sum(np.concatenate((far_target, near_target)) - low, np.concatenate((far, near)), high - low)
+
+    result = np.empty((count, 3))
+    result[tree.order] = acceleration
+    return constant * result
+
+
+def direct_acceleration(position, mass, constant=1.0, softening=1e-3, targets=None, chunk_size=1024):
+    """ Gravitational acceleration by direct summation over all pairs, for the given target indices or all points """
+    position = np.asarray(position, dtype=float)
+    mass = np.broadcast_to(np.asarray(mass, dtype=float), (len(position),))
+    targets = np.arange(len(position)) if targets is None else np.asarray(targets)
+    acceleration = np.empty((len(targets), 3))
+
+    for start in range(0, len(targets), chunk_size):
+        target = targets[start:start + chunk_size]
+        offset = position[np.newaxis, :, :] - position[target, np.newaxis, :]
+        distance_squared = np.einsum("ijk,ijk->ij", offset, offset) + softening * softening
+        inverse_cube = distance_squared ** -1.5
+        inverse_cube[np.arange(len(target)), target] = 0.0
+        acceleration[start:start + len(target)] = np.einsum("ijk,ij->ik", offset, inverse_cube * mass)
+
+    return constant * acceleration
@@ -1,56 +1,421 @@
 import numpy as np
-import math
+
+from pyphyslab.physics.integrator import make_integrator, EXPLICIT_EULER
+
+
+class ParticleSystem:
+    """ Structure of arrays holding the state of a whole particle population """
+
+    # Two particles touch when their centers are closer than the sum of their radii
+    RADIUS = 0.05
+
+    # Particles whose smoothed squared speed stays below SLEEP_SPEED ** 2 for SLEEP_TIME seconds fall asleep.
+    # Resting contacts make the raw speed oscillate from step to step, so it is averaged over about SLEEP_TIME
+    SLEEP_SPEED = 0.3
+    SLEEP_TIME = 0.5
+    # Only particles which touched something within the last SLEEP_CONTACT_STEPS steps rest, so a slow
+    # particle in flight stays awake
+    SLEEP_CONTACT_STEPS = 2
+
+    # Per particle arrays with the value a fresh slot starts from
+    ARRAYS = (
+        ("_position", 0.0),
+        ("_velocity", 0.0),
+        ("_acceleration", 0.0),
+        ("_accumulated_force", 0.0),
+        ("_inverse_mass", 0.0),
+        ("_damping", 1.0),
+        ("_radius", RADIUS),
+        ("_material", 0),
+        ("_awake", True),
+        ("_alive", True),
+        ("_motion", 0.0),
+        ("_rest_time", 0.0),
+        ("_untouched_steps", SLEEP_CONTACT_STEPS),
+    )
+
+    def __init__(self, capacity=16, integrator=EXPLICIT_EULER):
+        capacity = max(int(capacity), 1)
+        self._count = 0
+        self._integrator = make_integrator(integrator)
+        self._position = np.zeros((capacity, 3))
+        self._velocity = np.zeros((capacity, 3))
+        self._acceleration = np.zeros((capacity, 3))
+        self._accumulated_force = np.zeros((capacity, 3))
+        self._inverse_mass = np.zeros(capacity)
+        self._damping = np.ones(capacity)
+        self._radius = np.full(capacity, ParticleSystem.RADIUS)
+        self._material = np.zeros(capacity, dtype=np.int64)
+        self._awake = np.ones(capacity, dtype=bool)
+        self._alive = np.ones(capacity, dtype=bool)
+        self._motion = np.zeros(capacity)
+        self._rest_time = np.zeros(capacity)
+        self._untouched_steps = np.full(capacity, ParticleSystem.SLEEP_CONTACT_STEPS, dtype=np.int64)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return len(self._inverse_mass)
+
+    @property
+    def position(self):
+        return self._position[:self._count]
+
+    @property
+    def velocity(self):
+        return self._velocity[:self._count]
+
+    @property
+    def acceleration(self):
+        return self._acceleration[:self._count]
+
+    @property
+    def accumulated_force(self):
+        return self._accumulated_force[:self._count]
+
+    @property
+    def inverse_mass(self):
+        return self._inverse_mass[:self._count]
+
+    @property
+    def damping(self):
+        return self._damping[:self._count]
+
+    @property
+    def radius(self):
+        return self._radius[:self._count]
+
+    @property
+    def material(self):
+        """ Material id of every particle, a row of the world's MaterialTable """
+        return self._material[:self._count]
+
+    @property
+    def awake(self):
+        return self._awake[:self._count]
+
+    @property
+    def alive(self):
+        return self._alive[:self._count]
+
+    @property
+    def alive_count(self):
+        return int(np.count_nonzero(self._alive[:self._count]))
+
+    @property
+    def active_count(self):
+        return int(np.count_nonzero(self._awake[:self._count]))
+
+    def add(self, mass, velocity=(0.0, 0.0, 0.0), acceleration=(0.0, 0.0, 0.0), damping=0.85, position=(0.0, 0.0, 0.0), radius=RADIUS, material=0):
+        """ Append a particle and return its index """
+        if self._count == self.capacity:
+            self._reserve(2 * self.capacity)
+
+        index = self._count
+        self._count += 1
+
+        self._position[index] = position
+        self._velocity[index] = velocity
+        self._acceleration[index] = acceleration
+        self._accumulated_force[index] = 0.0
+        self._inverse_mass[index] = 1.0 / mass
+        self._damping[index] = damping
+        self._radius[index] = radius
+        self._material[index] = material
+        self._awake[index] = True
+        self._alive[index] = True
+        self._motion[index] = 0.0
+        self._rest_time[index] = 0.0
+        self._untouched_steps[index] = ParticleSystem.SLEEP_CONTACT_STEPS
+        return index
+
+    def add_many(self, mass, velocity=(0.0, 0.0, 0.0), acceleration=(0.0, 0.0, 0.0), damping=0.85, position=(0.0, 0.0, 0.0), radius=RADIUS, material=0):
+        """ Append one particle per entry of mass and return their indices. The other arguments broadcast """
+        mass = np.atleast_1d(np.asarray(mass, dtype=float))
+        count = len(mass)
+        if self._count + count > self.capacity:
+            self._reserve(max(2 * self.capacity, self._count + count))
+
+        indices = np.arange(self._count, self._count + count)
+        self._count += count
+
+        self._position[indices] = np.broadcast_to(position, (count, 3))
+        self._velocity[indices] = np.broadcast_to(velocity, (count, 3))
+        self._acceleration[indices] = np.broadcast_to(acceleration, (count, 3))
+        self._accumulated_force[indices] = 0.0
+        self._inverse_mass[indices] = 1.0 / mass
+        self._damping[indices] = np.broadcast_to(damping, (count,))
+        self._radius[indices] = np.broadcast_to(radius, (count,))
+        self._material[indices] = np.broadcast_to(material, (count,))
+        self._awake[indices] = True
+        self._alive[indices] = True
+        self._motion[indices] = 0.0
+        self._rest_time[indices] = 0.0
+        self._untouched_steps[indices] = ParticleSystem.SLEEP_CONTACT_STEPS
+        return indices
+
+    def kill(self, indices):
+        """ Take particles out of the simulation without freeing their slots. Dead particles stay
+            asleep, take part in no contact and keep their last position until they are revived """
+        self._alive[indices] = False
+        self._awake[indices] = False
+        self._velocity[indices] = 0.0
+        self._accumulated_force[indices] = 0.0
+
+    def revive(self, indices, mass, velocity=(0.0, 0.0, 0.0), acceleration=(0.0, 0.0, 0.0), damping=0.85, position=(0.0, 0.0, 0.0)):
+        """ Reuse the slots of dead particles for new ones. The other arguments broadcast like in add_many """
+        count = len(indices)
+        self._position[indices] = np.broadcast_to(position, (count, 3))
+        self._velocity[indices] = np.broadcast_to(velocity, (count, 3))
+        self._acceleration[indices] = np.broadcast_to(acceleration, (count, 3))
+        self._accumulated_force[indices] = 0.0
+        self._inverse_mass[indices] = 1.0 / np.broadcast_to(np.asarray(mass, dtype=float), (count,))
+        self._damping[indices] = np.broadcast_to(damping, (count,))
+        self._alive[indices] = True
+        self._awake[indices] = True
+        self._motion[indices] = 0.0
+        self._rest_time[indices] = 0.0
+        self._untouched_steps[indices] = ParticleSystem.SLEEP_CONTACT_STEPS
+
+    def adopt(self, particle):
+        """ Move the state of a particle into this system and turn the particle into a view of it """
+        source, source_index = particle._system, particle._index
+        index = self.add(
+            mass=1.0 / source._inverse_mass[source_index],
+            velocity=source._velocity[source_index],
+            acceleration=source._acceleration[source_index],
+            damping=source._damping[source_index],
+            position=source._position[source_index],
+            radius=source._radius[source_index],
+            material=source._material[source_index]
+        )
+        self._accumulated_force[index] = source._accumulated_force[source_index]
+        particle._system = self
+        particle._index = index
+        return index
+
+    @property
+    def integrator(self):
+        return self._integrator
+
+    @integrator.setter
+    def integrator(self, integrator):
+        self._integrator = make_integrator(integrator)
+
+    def integrate(self, delta_time, acceleration_field=None):
+        """ Advance every awake particle by one step of the selected integrator.
+            When some particles sleep the integrator only sees the gathered awake subset,
+            and so does acceleration_field """
+        if delta_time <= 0:
+            return
+
+        awake = self._awake[:self._count]
+        if awake.all():
+            self._integrator.step(self, delta_time, acceleration_field)
+        elif awake.any():
+            subset = _ParticleSubset(self, np.flatnonzero(awake))
+            self._integrator.step(subset, delta_time, acceleration_field)
+            subset.scatter()
+        self._accumulated_force[:self._count] = 0.0
+
+    def update_sleep(self, delta_time, touching=None, sleep_speed=SLEEP_SPEED, sleep_time=SLEEP_TIME):
+        """ Put particles to sleep whose smoothed motion stayed below sleep_speed for sleep_time seconds
+            while in contact. touching holds the indices of the particles in contact in this step;
+            None does not track contacts and lets every slow particle sleep """
+        if delta_time <= 0:
+            return
+
+        n = self._count
+        awake = self._awake[:n]
+        motion = self._motion[:n]
+        rest_time = self._rest_time[:n]
+
+        current_motion = np.einsum("ij,ij->i", self._velocity[:n], self._velocity[:n])
+        motion += (current_motion - motion) * min(delta_time / sleep_time, 1.0)
+
+        resting = awake & (motion < sleep_speed * sleep_speed)
+        if touching is not None:
+            untouched_steps = self._untouched_steps[:n]
+            untouched_steps[awake] = np.minimum(untouched_steps[awake] + 1, ParticleSystem.SLEEP_CONTACT_STEPS)
+            untouched_steps[touching] = 0
+            resting &= untouched_steps < ParticleSystem.SLEEP_CONTACT_STEPS
+        rest_time[resting] += delta_time
+        rest_time[~resting] = 0.0
+
+        falling_asleep = resting & (rest_time >= sleep_time)
+        if falling_asleep.any():
+            awake[falling_asleep] = False
+            self._velocity[:n][falling_asleep] = 0.0
+
+    def wake(self, indices, sleep_speed=SLEEP_SPEED):
+        """ Wake particles up. Their motion restarts above the threshold so they stay awake for a while.
+            Dead particles stay asleep """
+        self._awake[indices] = self._alive[indices]
+        self._motion[indices] = 2.0 * sleep_speed * sleep_speed
+        self._rest_time[indices] = 0.0
+
+    def integrate_one(self, index, delta_time):
+        """ Advance a single particle by one explicit Euler step """
+        if delta_time <= 0:
+            return
+
+        self._position[index] += self._velocity[index] * delta_time
+
+        result_acceleration = self._acceleration[index] + self._accumulated_force[index] * self._inverse_mass[index]
+        self._velocity[index] += result_acceleration * delta_time
+
+        self._velocity[index] *= self._damping[index] ** delta_time
+
+        self._accumulated_force[index] = 0.0
+
+    def state(self):
+        """ Copies of every per particle array, keyed without the leading underscore """
+        return {name[1:]: getattr(self, name)[:self._count].copy() for name, _ in ParticleSystem.ARRAYS}
+
+    def set_state(self, state):
+        """ Replace the population with the arrays produced by state() """
+        count = len(state["inverse_mass"])
+        if count > self.capacity:
+            self._reserve(count)
+        for name, default in ParticleSystem.ARRAYS:
+            array = getattr(self, name)
+            array[:count] = state.get(name[1:], default)
+            array[count:] = default
+        self._count = count
+
+    def _reserve(self, capacity):
+        for name, default in ParticleSystem.ARRAYS:
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], default, dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+
+class _ParticleSubset:
+    """ Gathered copy of some particles which integrators can step like a whole system """
+
+    def __init__(self, system, indices):
+        self._system = system
+        self._indices = indices
+        self.count = len(indices)
+        self.position = system.position[indices]
+        self.velocity = system.velocity[indices]
+        self.acceleration = system.acceleration[indices]
+        self.accumulated_force = system.accumulated_force[indices]
+        self.inverse_mass = system.inverse_mass[indices]
+        self.damping = system.damping[indices]
+
+    def scatter(self):
+        self._system.position[self._indices] = self.position
+        self._system.velocity[self._indices] = self.velocity
+
 
 class Particle:
-    def __init__(self, mass, velocity = [0.0, 0.0, 0.0], acceleration = [0.0, 0.0, 0.0], damping = 0.85):
-        self._position = np.array([0.0,0.0,0.0])
-        self._velocity = np.array(velocity)
-        self._acceleration = np.array(acceleration)
-        self.mass = mass
-        self._damping = damping
-        self._accumulated_force = np.array([0.0,0.0,0.0])
+    """ Index view into a particle system. A particle created on its own owns a single slot system """
+
+    def __init__(self, mass, velocity = [0.0, 0.0, 0.0], acceleration = [0.0, 0.0, 0.0], damping = 0.85, system = None):
+        if system is None:
+            system = ParticleSystem(capacity=1)
+        self._system = system
+        self._index = system.add(mass, velocity, acceleration, damping)
+
+    @classmethod
+    def view(cls, system, index):
+        """ Particle view onto an existing slot of a system """
+        particle = cls.__new__(cls)
+        particle._system = system
+        particle._index = index
+        return particle
+
+    @property
+    def system(self):
+        return self._system
+
+    @property
+    def index(self):
+        return self._index
 
     @property
     def position(self):
-        return self._position
+        return self._system._position[self._index]
 
     @property
     def velocity(self):
-        return self._velocity
-    
+        return self._system._velocity[self._index]
+
     @property
     def acceleration(self):
-        return self._acceleration
-    
+        return self._system._acceleration[self._index]
+
+    @property
+    def mass(self):
+        return 1.0 / self._system._inverse_mass[self._index]
+
+    @property
+    def inverse_mass(self):
+        return self._system._inverse_mass[self._index]
+
+    @property
+    def damping(self):
+        return self._system._damping[self._index]
+
+    @property
+    def radius(self):
+        return self._system._radius[self._index]
+
+    @property
+    def material(self):
+        return int(self._system._material[self._index])
+
+    @property
+    def awake(self):
+        return bool(self._system._awake[self._index])
+
     @position.setter
     def position(self, position):
-        self._position = np.array(position)
+        self._system._position[self._index] = position
+        self._system.wake(self._index)
 
     @velocity.setter
     def velocity(self, velocity):
-        self._velocity =  np.array(velocity)
-    
+        self._system._velocity[self._index] = velocity
+        self._system.wake(self._index)
+
     @acceleration.setter
     def acceleration(self, acceleration):
-        self._acceleration = acceleration
+        self._system._acceleration[self._index] = acceleration
 
-    def add_force(self, force):
-        self._accumulated_force += np.array(force)
+    @mass.setter
+    def mass(self, mass):
+        self._system._inverse_mass[self._index] = 1.0 / mass
 
-    def clear_accumulated_force(self):
-        self._accumulated_force = np.array([0.0,0.0,0.0])
+    @damping.setter
+    def damping(self, damping):
+        self._system._damping[self._index] = damping
 
-    def resolve(self, delta_time):
-        
-        if delta_time <= 0:
-            return
+    @radius.setter
+    def radius(self, radius):
+        self._system._radius[self._index] = radius
+
+    @material.setter
+    def material(self, material):
+        self._system._material[self._index] = material
 
-        self._position += self._velocity * delta_time
+    def add_force(self, force):
+        self._system._accumulated_force[self._index] += force
+        self._system.wake(self._index)
 
-        inverse_mass = 1 / self.mass
-        result_acceleration = self._acceleration + self._accumulated_force * inverse_mass
-        self._velocity += result_acceleration * delta_time
+    def wake(self):
+        self._system.wake(self._index)
 
-        self._velocity *= math.pow(self._damping, delta_time)
+    def clear_accumulated_force(self):
+        self._system._accumulated_force[self._index] = 0.0
 
-        self.clear_accumulated_force()
\ No newline at end of file
+    def resolve(self, delta_time):
+        self._system.integrate_one(self._index, delta_time)
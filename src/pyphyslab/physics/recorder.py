@@ -0,0 +1,264 @@
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+
+TIME_COLUMN = "time"
+POSITION_COLUMN = "position"
+VELOCITY_COLUMN = "velocity"
+CONTACT_STEP_COLUMN = "contact_step"
+CONTACT_FIRST_COLUMN = "contact_first"
+CONTACT_SECOND_COLUMN = "contact_second"
+CONTACT_KIND_COLUMN = "contact_kind"
+
+PARTICLE_CONTACT = 0
+STATIC_CONTACT = 1
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_SIZE = 128
+
+
+def _write_npy_header(file, dtype, shape):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    padding = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError("Shape too long for the reserved .npy header")
+    header = header + " " * padding + "\n"
+    file.seek(0)
+    file.write(_NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+class ColumnFile:
+    """ .npy file growing along its first axis. The header is rewritten with the current row count
+        on every sync so the file can be opened with np.load(mmap_mode="r") while it is still growing """
+
+    def __init__(self, path, dtype, row_shape=()):
+        self._path = path
+        self._dtype = np.dtype(dtype)
+        self._row_shape = tuple(row_shape)
+        self._rows = 0
+        self._file = open(path, "wb+")
+        self.sync()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def append(self, block):
+        block = np.ascontiguousarray(block, dtype=self._dtype)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(block.tobytes())
+        self._rows += len(block)
+
+    def sync(self):
+        _write_npy_header(self._file, self._dtype, (self._rows,) + self._row_shape)
+        self._file.flush()
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+class _BlockWriter(threading.Thread):
+    """ Background thread appending blocks to column files. Buffers are handed back through their free queue,
+        also when a write fails; the error is kept and raised by the next check in the recording thread """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self._tasks = queue.Queue()
+        self._error = None
+
+    def append(self, column, block, free=None, rows=None):
+        self._tasks.put((column, block, free, rows))
+
+    def sync(self, columns):
+        for column in columns:
+            self._tasks.put((column, None, None, None))
+        self._tasks.join()
+
+    def stop(self):
+        self._tasks.put(None)
+        self.join()
+
+    def check(self):
+        """ Raise the first write error since the last check """
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                self._tasks.task_done()
+                return
+            column, block, free, rows = task
+            try:
+                if block is not None:
+                    column.append(block if rows is None else block[:rows])
+                column.sync()
+            except Exception as error:
+                if self._error is None:
+                    self._error = error
+            finally:
+                if block is not None and free is not None:
+                    free.put(block)
+                self._tasks.task_done()
+
+
+class TrajectoryRecorder:
+    """ Streams per step state of a world into a directory of growable .npy column files.
+        State is buffered in blocks of block_steps rows; full blocks are written by a background
+        thread while the next block fills, so memory use stays constant however long the run is.
+        Attach it with World.attach_recorder and read it back with load_trajectory """
+
+    def __init__(self, directory, block_steps=1024, record_every=1, series=(POSITION_COLUMN, VELOCITY_COLUMN), contacts=True, buffers=2):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._block_steps = max(int(block_steps), 1)
+        self._record_every = max(int(record_every), 1)
+        self._series = tuple(series)
+        self._contacts = contacts
+        self._buffer_count = max(int(buffers), 2)
+
+        self._count = None
+        self._step = 0
+        self._rows = 0
+        self._columns = {}
+        self._free = {}
+        self._current = {}
+        self._contact_blocks = []
+
+        self._writer = _BlockWriter()
+        self._writer.start()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def steps(self):
+        return self._step
+
+    def record(self, world, time):
+        """ Called by the world after every step. Raises the error of a failed background write """
+        self._writer.check()
+        self._step += 1
+        system = world.system
+
+        if self._contacts:
+            self._record_contacts(world)
+
+        if self._step % self._record_every != 0:
+            return
+
+        if self._count is None:
+            self._open(system.count)
+        elif system.count != self._count:
+            raise ValueError("Particle count changed while recording")
+
+        self._current[TIME_COLUMN][self._rows] = time
+        for name in self._series:
+            self._current[name][self._rows] = getattr(system, name)
+        self._rows += 1
+
+        if self._rows == self._block_steps:
+            self._hand_over_blocks()
+
+    def flush(self):
+        """ Write everything recorded so far and update the file headers """
+        if self._count is not None and self._rows > 0:
+            self._hand_over_blocks()
+        self._hand_over_contacts()
+        self._writer.sync(self._columns.values())
+        self._writer.check()
+
+    def close(self):
+        if not self._writer.is_alive():
+            return
+        try:
+            self.flush()
+        finally:
+            self._writer.stop()
+            columns, self._columns = self._columns, {}
+            for column in columns.values():
+                column.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self, count):
+        self._count = count
+        row_shapes = {TIME_COLUMN: ((), np.float64)}
+        for name in self._series:
+            row_shapes[name] = ((count, 3), np.float64)
+
+        for name, (row_shape, dtype) in row_shapes.items():
+            self._columns[name] = ColumnFile(self._path(name), dtype, row_shape)
+            self._free[name] = queue.Queue()
+            for _ in range(self._buffer_count - 1):
+                self._free[name].put(np.empty((self._block_steps,) + row_shape, dtype=dtype))
+            self._current[name] = np.empty((self._block_steps,) + row_shape, dtype=dtype)
+
+        if self._contacts:
+            for name in (CONTACT_STEP_COLUMN, CONTACT_FIRST_COLUMN, CONTACT_SECOND_COLUMN, CONTACT_KIND_COLUMN):
+                self._columns[name] = ColumnFile(self._path(name), np.int64)
+
+    def _hand_over_blocks(self):
+        for name, block in self._current.items():
+            self._writer.append(self._columns[name], block, self._free[name], self._rows)
+            # Blocks when the writer is more than a buffer behind, which keeps memory bounded
+            self._current[name] = self._free[name].get()
+        self._rows = 0
+        self._hand_over_contacts()
+
+    def _record_contacts(self, world):
+        first, second = world.new_particle_contacts
+        particle, collider = world.new_static_contacts
+        if len(first) == 0 and len(particle) == 0:
+            return
+
+        count = len(first) + len(particle)
+        block = np.empty((4, count), dtype=np.int64)
+        block[0] = self._step
+        block[1, :len(first)] = first
+        block[1, len(first):] = particle
+        block[2, :len(first)] = second
+        block[2, len(first):] = collider
+        block[3, :len(first)] = PARTICLE_CONTACT
+        block[3, len(first):] = STATIC_CONTACT
+        self._contact_blocks.append(block)
+
+    def _hand_over_contacts(self):
+        if not self._contact_blocks or CONTACT_STEP_COLUMN not in self._columns:
+            return
+        events = np.concatenate(self._contact_blocks, axis=1)
+        self._contact_blocks = []
+        for row, name in enumerate((CONTACT_STEP_COLUMN, CONTACT_FIRST_COLUMN, CONTACT_SECOND_COLUMN, CONTACT_KIND_COLUMN)):
+            self._writer.append(self._columns[name], events[row])
+
+    def _path(self, name):
+        return os.path.join(self._directory, name + ".npy")
+
+
+def load_trajectory(directory, mmap_mode="r"):
+    """ Open every column of a recorded trajectory. Arrays are memory mapped, nothing is copied """
+    trajectory = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".npy"):
+            path = os.path.join(directory, file_name)
+            try:
+                trajectory[file_name[:-4]] = np.load(path, mmap_mode=mmap_mode)
+            except ValueError:
+                # Empty columns can not be memory mapped
+                trajectory[file_name[:-4]] = np.load(path)
+    return trajectory
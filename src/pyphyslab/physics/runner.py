@@ -0,0 +1,118 @@
+import numpy as np
+
+from pyphyslab.physics.particle import Particle
+from pyphyslab.physics.world import World
+from pyphyslab.physics.collider import PlaneCollider, BoxCollider
+
+POSITION_SERIES = "position"
+VELOCITY_SERIES = "velocity"
+
+_COLLIDERS = {
+    "plane": PlaneCollider,
+    "box": BoxCollider,
+}
+
+
+class ParticleSpec:
+    """ Initial state of one particle in a scenario. force is applied once, before the first step """
+
+    def __init__(self, mass, position=(0.0, 0.0, 0.0), velocity=(0.0, 0.0, 0.0), acceleration=(0.0, 0.0, 0.0), damping=0.85, force=(0.0, 0.0, 0.0)):
+        self.mass = mass
+        self.position = position
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.damping = damping
+        self.force = force
+
+    def build(self):
+        particle = Particle(
+            mass=self.mass,
+            velocity=self.velocity,
+            acceleration=self.acceleration,
+            damping=self.damping
+        )
+        particle.position = self.position
+        particle.add_force(self.force)
+        return particle
+
+
+class Scenario:
+    """ Everything needed to build and step a world without a window """
+
+    def __init__(self, particles, delta_time=1 / 60, steps=600, world_options=None, colliders=()):
+        self.particles = list(particles)
+        self.delta_time = delta_time
+        self.steps = steps
+        self.world_options = dict(world_options or {})
+        self.colliders = list(colliders)
+
+    @classmethod
+    def from_dict(cls, description):
+        """ Build a scenario from plain data, e.g. loaded from JSON """
+        colliders = []
+        for collider in description.get("colliders", ()):
+            collider = dict(collider)
+            kind = collider.pop("type")
+            if kind not in _COLLIDERS:
+                raise ValueError("Unknown collider type: " + str(kind))
+            colliders.append(_COLLIDERS[kind](**collider))
+
+        return cls(
+            particles=[ParticleSpec(**particle) for particle in description["particles"]],
+            delta_time=description.get("delta_time", 1 / 60),
+            steps=description.get("steps", 600),
+            world_options=description.get("world", {}),
+            colliders=colliders
+        )
+
+    @classmethod
+    def two_particle_contact(cls, gravity=True, steps=600, delta_time=1 / 60):
+        """ The heavy and the light particle pushed towards each other from examples/two_particle_contact_with_gravity.py """
+        acceleration = (0.0, -9.87, 0.0) if gravity else (0.0, 0.0, 0.0)
+        return cls(
+            particles=[
+                ParticleSpec(mass=100.0, position=(0.6, 0.5, -4.0), acceleration=acceleration, damping=0.85, force=(-3000.0, 0.0, 0.0)),
+                ParticleSpec(mass=1.0, position=(0.3, 0.5, -4.0), acceleration=acceleration, damping=0.95, force=(30.0, 0.0, 0.0)),
+            ],
+            delta_time=delta_time,
+            steps=steps
+        )
+
+    def build_world(self):
+        world = World(*[particle.build() for particle in self.particles], **self.world_options)
+        for collider in self.colliders:
+            world.add_static_collider(collider)
+        return world
+
+
+class HeadlessRunner:
+    """ Steps a scenario as fast as the CPU allows and returns the sampled state as arrays.
+        Each series has shape (samples, N, 3); "time" has shape (samples,) """
+
+    def __init__(self, series=(POSITION_SERIES, VELOCITY_SERIES), sample_every=1):
+        self._series = tuple(series)
+        self._sample_every = max(int(sample_every), 1)
+
+    def run(self, scenario, world=None):
+        world = world if world is not None else scenario.build_world()
+        system = world.system
+        samples = scenario.steps // self._sample_every + 1
+
+        result = {"time": np.empty(samples)}
+        for name in self._series:
+            result[name] = np.empty((samples, system.count, 3))
+
+        self._sample(result, 0, 0.0, system)
+        sample = 1
+        for step in range(1, scenario.steps + 1):
+            world.run_physics(scenario.delta_time)
+            if step % self._sample_every == 0:
+                self._sample(result, sample, step * scenario.delta_time, system)
+                sample += 1
+
+        return result
+
+    def _sample(self, result, sample, time, system):
+        result["time"][sample] = time
+        for name in self._series:
+            result[name][sample] = getattr(system, name)
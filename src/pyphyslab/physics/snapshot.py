@@ -0,0 +1,60 @@
+import struct
+
+import numpy as np
+
+SNAPSHOT_MAGIC = b"PYPHSNAP"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<8sHH")
+_ENTRY = struct.Struct("<BBBQ")
+
+
+def pack_snapshot(arrays, version=SNAPSHOT_VERSION):
+    """ Serialize a dict of arrays into one binary blob.
+        Layout: magic, version, entry count, then per entry the name, dtype, shape and raw bytes """
+    parts = [_HEADER.pack(SNAPSHOT_MAGIC, version, len(arrays))]
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        name_bytes = name.encode("ascii")
+        dtype_bytes = array.dtype.str.encode("ascii")
+        parts.append(_ENTRY.pack(len(name_bytes), len(dtype_bytes), array.ndim, array.nbytes))
+        parts.append(name_bytes)
+        parts.append(dtype_bytes)
+        parts.append(struct.pack("<%dq" % array.ndim, *array.shape))
+        parts.append(array.tobytes())
+    return b"".join(parts)
+
+
+def unpack_snapshot(blob):
+    """ Read a blob written by pack_snapshot. Returns (version, dict of arrays) """
+    blob = memoryview(blob)
+    magic, version, count = _HEADER.unpack_from(blob, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a world snapshot")
+    if version > SNAPSHOT_VERSION:
+        raise ValueError("Snapshot version %d is newer than the supported version %d" % (version, SNAPSHOT_VERSION))
+
+    offset = _HEADER.size
+    arrays = {}
+    for _ in range(count):
+        name_length, dtype_length, ndim, nbytes = _ENTRY.unpack_from(blob, offset)
+        offset += _ENTRY.size
+        name = bytes(blob[offset:offset + name_length]).decode("ascii")
+        offset += name_length
+        dtype = np.dtype(bytes(blob[offset:offset + dtype_length]).decode("ascii"))
+        offset += dtype_length
+        shape = struct.unpack_from("<%dq" % ndim, blob, offset)
+        offset += 8 * ndim
+        arrays[name] = np.reshape(np.frombuffer(blob[offset:offset + nbytes], dtype=dtype), shape).copy()
+        offset += nbytes
+    return version, arrays
+
+
+def save_snapshot(path, blob):
+    with open(path, "wb") as file:
+        file.write(blob)
+
+
+def load_snapshot(path):
+    with open(path, "rb") as file:
+        return file.read()
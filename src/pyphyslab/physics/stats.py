@@ -0,0 +1,104 @@
+import csv
+import json
+from time import perf_counter_ns
+
+import numpy as np
+
+STEP_COLUMN = "step"
+
+BROADPHASE_PHASE = "broadphase"
+NARROWPHASE_PHASE = "narrowphase"
+RESOLVE_PHASE = "resolve"
+STATIC_PHASE = "static"
+LINKS_PHASE = "links"
+CCD_PHASE = "ccd"
+INTEGRATE_PHASE = "integrate"
+TOTAL_PHASE = "total"
+PHASES = (BROADPHASE_PHASE, NARROWPHASE_PHASE, RESOLVE_PHASE, STATIC_PHASE, LINKS_PHASE, CCD_PHASE, INTEGRATE_PHASE, TOTAL_PHASE)
+
+PAIRS_TESTED_COUNTER = "pairs_tested"
+CONTACTS_CREATED_COUNTER = "contacts_created"
+STATIC_CONTACTS_COUNTER = "static_contacts"
+ACTIVE_PARTICLES_COUNTER = "active_particles"
+COUNTERS = (PAIRS_TESTED_COUNTER, CONTACTS_CREATED_COUNTER, STATIC_CONTACTS_COUNTER, ACTIVE_PARTICLES_COUNTER)
+
+COLUMNS = (STEP_COLUMN,) + PHASES + COUNTERS
+
+
+class StepStats:
+    """ Ring buffer with the phase times in nanoseconds and the counters of the last capacity steps.
+        Attach it with World.attach_stats; a world without stats does no timing at all """
+
+    def __init__(self, capacity=1024):
+        self._capacity = max(int(capacity), 1)
+        self._columns = {name: np.zeros(self._capacity, dtype=np.int64) for name in COLUMNS}
+        self._steps = 0
+        self._row = 0
+        self._start = 0
+        self._last = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def steps(self):
+        """ Number of steps recorded since the last clear, including the ones overwritten """
+        return self._steps
+
+    def __len__(self):
+        return min(self._steps, self._capacity)
+
+    def begin(self):
+        """ Start timing a step """
+        self._row = self._steps % self._capacity
+        self._columns[STEP_COLUMN][self._row] = self._steps
+        self._start = self._last = perf_counter_ns()
+
+    def lap(self, phase):
+        """ Charge the time since the previous lap to phase """
+        now = perf_counter_ns()
+        self._columns[phase][self._row] = now - self._last
+        self._last = now
+
+    def count(self, counter, value):
+        self._columns[counter][self._row] = value
+
+    def end(self):
+        self._columns[TOTAL_PHASE][self._row] = perf_counter_ns() - self._start
+        self._steps += 1
+
+    def column(self, name):
+        """ Copy of one column, oldest step first """
+        column = self._columns[name]
+        if self._steps <= self._capacity:
+            return column[:self._steps].copy()
+        return np.roll(column, -(self._steps % self._capacity))
+
+    def table(self):
+        """ Every column, oldest step first """
+        return {name: self.column(name) for name in COLUMNS}
+
+    def summary(self):
+        """ Mean of every phase in milliseconds and of every counter over the buffered steps """
+        if len(self) == 0:
+            return {}
+        summary = {name + "_ms": float(self.column(name).mean()) * 1e-6 for name in PHASES}
+        summary.update({name: float(self.column(name).mean()) for name in COUNTERS})
+        return summary
+
+    def clear(self):
+        for column in self._columns.values():
+            column[:] = 0
+        self._steps = 0
+
+    def to_csv(self, path):
+        table = self.table()
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            writer.writerows(zip(*[table[name].tolist() for name in COLUMNS]))
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump({name: column.tolist() for name, column in self.table().items()}, file)
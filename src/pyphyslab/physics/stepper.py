@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class FixedTimestep:
+    """ Advances a world in fixed physics steps from variable frame times.
+        Leftover time is carried in an accumulator and exposed as an interpolation alpha
+        so the scene can blend between the previous and the current state """
+
+    def __init__(self, world, step=1 / 240, max_steps=8):
+        if step <= 0:
+            raise ValueError("step must be positive")
+        self._world = world
+        self._step = step
+        self._max_steps = max(int(max_steps), 1)
+        self._accumulator = 0.0
+        self._alpha = 0.0
+        self._previous_position = world.system.position.copy()
+        self.time = 0.0
+
+    @property
+    def world(self):
+        return self._world
+
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def max_steps(self):
+        return self._max_steps
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @property
+    def previous_position(self):
+        return self._previous_position
+
+    def advance(self, frame_time):
+        """ Run as many fixed steps as the frame time allows and return their count """
+        self._accumulator += max(frame_time, 0.0)
+        steps = min(int(self._accumulator // self._step), self._max_steps)
+
+        for index in range(steps):
+            if index == steps - 1:
+                self._previous_position = self._world.system.position.copy()
+            self._world.run_physics(self._step)
+            self._accumulator -= self._step
+            self.time += self._step
+
+        if self._accumulator >= self._step:
+            # Too far behind. Drop the backlog instead of trying to catch up on later frames
+            self._accumulator %= self._step
+
+        if len(self._previous_position) != self._world.system.count:
+            self._previous_position = self._world.system.position.copy()
+
+        self._alpha = self._accumulator / self._step
+        return steps
+
+    def interpolated_position(self, out=None):
+        """ Positions of all particles blended between the last two physics steps """
+        current = self._world.system.position
+        if out is None:
+            out = np.empty_like(current)
+        np.subtract(current, self._previous_position, out=out)
+        out *= self._alpha
+        out += self._previous_position
+        return out
+
+    def interpolate(self, particle):
+        """ Position of one particle blended between the last two physics steps """
+        previous = self._previous_position[particle.index]
+        return previous + (particle.position - previous) * self._alpha
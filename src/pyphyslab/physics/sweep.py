@@ -0,0 +1,131 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from pyphyslab.physics.runner import HeadlessRunner, Scenario, ParticleSpec
+from pyphyslab.physics.collider import PlaneCollider, RESTITUTION
+
+INDEX_COLUMN = "index"
+
+
+def two_particle_scenario(mass=100.0, damping=0.85, restitution=RESTITUTION, force=-3000.0, steps=600, delta_time=1 / 60):
+    """ Two particle contact with gravity where the heavy particle's mass, damping and push
+        and the ground restitution are free parameters """
+    scenario = Scenario.two_particle_contact(gravity=True, steps=steps, delta_time=delta_time)
+    heavy = scenario.particles[0]
+    scenario.particles[0] = ParticleSpec(
+        mass=mass,
+        position=heavy.position,
+        acceleration=heavy.acceleration,
+        damping=damping,
+        force=(force, 0.0, 0.0)
+    )
+    scenario.world_options["ground"] = False
+    scenario.colliders.append(PlaneCollider.ground(restitution))
+    return scenario
+
+
+def final_state_metrics(result):
+    """ Final position of every particle and its highest point over the run """
+    metrics = {}
+    final_position = result["position"][-1]
+    highest = result["position"][:, :, 1].max(axis=0)
+    for index in range(final_position.shape[0]):
+        for axis, name in enumerate("xyz"):
+            metrics["p%d_%s" % (index, name)] = final_position[index, axis]
+        metrics["p%d_max_y" % index] = highest[index]
+    return metrics
+
+
+def _run_chunk(scenario_factory, metrics, sample_every, chunk):
+    runner = HeadlessRunner(sample_every=sample_every)
+    rows = []
+    for index, parameters in chunk:
+        result = runner.run(scenario_factory(**parameters))
+        row = {INDEX_COLUMN: index}
+        row.update(parameters)
+        row.update(metrics(result))
+        rows.append(row)
+    return rows
+
+
+class ParameterSweep:
+    """ Runs a scenario for every combination of a parameter grid on a process pool.
+        scenario_factory(**parameters) must return a Scenario and, like metrics, be picklable
+        (a module level function). Results are gathered into one columnar table: a dict of
+        equally long arrays. With a checkpoint path finished chunks are saved as they complete
+        and a later run resumes from them """
+
+    def __init__(self, scenario_factory, grid, metrics=final_state_metrics, chunk_size=16, max_workers=None, sample_every=1):
+        self._scenario_factory = scenario_factory
+        self._grid = {name: list(values) for name, values in grid.items()}
+        self._metrics = metrics
+        self._chunk_size = max(int(chunk_size), 1)
+        self._max_workers = max_workers
+        self._sample_every = sample_every
+
+    @property
+    def parameters(self):
+        """ Every parameter combination, in table order """
+        names = list(self._grid)
+        return [dict(zip(names, values)) for values in itertools.product(*self._grid.values())]
+
+    def __len__(self):
+        return int(np.prod([len(values) for values in self._grid.values()]))
+
+    def run(self, checkpoint=None):
+        """ Run every combination not yet in the checkpoint. Raises ValueError when the checkpoint
+            was written for another grid """
+        parameters = self.parameters
+        rows = load_table_rows(checkpoint) if checkpoint is not None and os.path.exists(checkpoint) else []
+        for row in rows:
+            self._check_resumed(row, parameters, checkpoint)
+        done = {row[INDEX_COLUMN] for row in rows}
+
+        pending = [(index, combination) for index, combination in enumerate(parameters) if index not in done]
+        chunks = [pending[start:start + self._chunk_size] for start in range(0, len(pending), self._chunk_size)]
+
+        if chunks:
+            with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+                futures = [
+                    executor.submit(_run_chunk, self._scenario_factory, self._metrics, self._sample_every, chunk)
+                    for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    rows.extend(future.result())
+                    if checkpoint is not None:
+                        save_table(checkpoint, rows_to_table(rows))
+
+        return rows_to_table(rows)
+
+    def _check_resumed(self, row, parameters, checkpoint):
+        index = row[INDEX_COLUMN]
+        if not 0 <= index < len(parameters) or any(name not in row or row[name] != value for name, value in parameters[index].items()):
+            raise ValueError("Checkpoint %s does not match the parameter grid at index %d; delete it or use another path" % (checkpoint, index))
+
+
+def rows_to_table(rows):
+    """ Turn a list of row dicts into a dict of columns sorted by the index column """
+    rows = sorted(rows, key=lambda row: row[INDEX_COLUMN])
+    names = list(rows[0]) if rows else [INDEX_COLUMN]
+    return {name: np.array([row[name] for row in rows]) for name in names}
+
+
+def save_table(path, table):
+    """ Write a columnar table atomically as .npz """
+    temporary = path + ".tmp.npz"
+    np.savez(temporary, **table)
+    os.replace(temporary, path)
+
+
+def load_table(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def load_table_rows(path):
+    table = load_table(path)
+    names = list(table)
+    return [dict(zip(names, values)) for values in zip(*[table[name].tolist() for name in names])]
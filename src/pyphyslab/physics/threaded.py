@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from pyphyslab.physics.stepper import FixedTimestep
+
+
+class PhysicsState:
+    """ One published state of a world: positions of the last two steps and velocities. published_at is the
+        perf_counter time the last step corresponds to, the publish time less the unstepped leftover of the
+        fixed timestep. alpha is set when the state is read, from the time passed since then """
+
+    def __init__(self):
+        self.position = np.empty((0, 3))
+        self.previous_position = np.empty((0, 3))
+        self.velocity = np.empty((0, 3))
+        self.alpha = 0.0
+        self.published_at = 0.0
+        self.step = 1.0
+        self.time = 0.0
+        self.steps = 0
+
+    def update_alpha(self, now=None):
+        """ Interpolation alpha at perf_counter time now, clamped to [0, 1] """
+        now = time.perf_counter() if now is None else now
+        self.alpha = min(max((now - self.published_at) / self.step, 0.0), 1.0)
+        return self.alpha
+
+    def fill(self, stepper, steps, published_at):
+        system = stepper.world.system
+        if len(self.position) != system.count:
+            self.position = np.empty((system.count, 3))
+            self.previous_position = np.empty((system.count, 3))
+            self.velocity = np.empty((system.count, 3))
+        self.position[:] = system.position
+        self.previous_position[:] = stepper.previous_position
+        self.velocity[:] = system.velocity
+        self.published_at = published_at - stepper.alpha * stepper.step
+        self.step = stepper.step
+        self.time = stepper.time
+        self.steps = steps
+
+    def interpolated_position(self, index=None):
+        """ Positions blended between the last two steps, of every particle or of one index """
+        if index is None:
+            return self.previous_position + (self.position - self.previous_position) * self.alpha
+        previous = self.previous_position[index]
+        return previous + (self.position[index] - previous) * self.alpha
+
+
+class TripleBuffer:
+    """ Three slots shared by one writer and one reader. The writer fills its back slot and swaps it
+        with the ready slot; the reader swaps the ready slot into its front slot when a newer one exists.
+        The lock only guards the index swaps, never a copy, so neither side waits for the other's work """
+
+    def __init__(self, factory):
+        self._slots = [factory(), factory(), factory()]
+        self._back = 0
+        self._ready = 1
+        self._front = 2
+        self._fresh = False
+        self._lock = threading.Lock()
+
+    @property
+    def back(self):
+        """ Slot owned by the writer """
+        return self._slots[self._back]
+
+    def publish(self):
+        with self._lock:
+            self._back, self._ready = self._ready, self._back
+            self._fresh = True
+
+    def latest(self):
+        """ Most recently published slot. It stays untouched by the writer until the next call """
+        with self._lock:
+            if self._fresh:
+                self._front, self._ready = self._ready, self._front
+                self._fresh = False
+        return self._slots[self._front]
+
+
+class PhysicsThread:
+    """ Steps a world in fixed steps on a background thread in real time and publishes every advanced
+        state into a triple buffer. The render loop reads latest() at its own rate and never waits for a step.
+        The world must not be touched from other threads while running; pass changes through submit.
+        Both threads share the GIL, so this decouples the step rate from the frame rate rather than
+        adding parallel throughput. An error raised by a step stops the thread and is raised again
+        by the next latest() or stop() """
+
+    def __init__(self, world, step=1 / 240, max_steps=8):
+        self._stepper = FixedTimestep(world, step, max_steps)
+        self._buffer = TripleBuffer(PhysicsState)
+        self._tasks = queue.Queue()
+        self._steps = 0
+        self._running = False
+        self._paused = False
+        self._thread = None
+        self._error = None
+        self._buffer.back.fill(self._stepper, 0, time.perf_counter())
+        self._buffer.publish()
+
+    @property
+    def world(self):
+        return self._stepper.world
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, paused):
+        self._paused = paused
+
+    def latest(self):
+        """ Latest consistent PhysicsState with its alpha updated to now. Valid until the next call """
+        self._raise_error()
+        state = self._buffer.latest()
+        state.update_alpha()
+        return state
+
+    def submit(self, function):
+        """ Run function(world) on the physics thread before its next step """
+        self._tasks.put(function)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as error:
+            self._error = error
+            self._running = False
+
+    def _loop(self):
+        step = self._stepper.step
+        last = time.perf_counter()
+        while self._running:
+            while not self._tasks.empty():
+                self._tasks.get()(self._stepper.world)
+
+            now = time.perf_counter()
+            frame_time, last = now - last, now
+            if not self._paused:
+                steps = self._stepper.advance(frame_time)
+                if steps:
+                    self._steps += steps
+                    self._buffer.back.fill(self._stepper, self._steps, now)
+                    self._buffer.publish()
+
+            # Sleep until the next step is due
+            time.sleep(max(step - (time.perf_counter() - last), 0.0))
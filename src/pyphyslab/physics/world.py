@@ -1,30 +1,356 @@
-from pyphyslab.physics.collision import ParticleCollisionDetector, GroundCollisionDetector
+import numpy as np
+
+from pyphyslab.physics.collision import ParticleCollisionDetector, BatchContactResolver, ParticleContactResolver
+from pyphyslab.physics.material import MaterialTable
+from pyphyslab.physics.force import ForceRegistry
+from pyphyslab.physics.link import LinkConstraints
+from pyphyslab.physics.collider import StaticColliderSet, PlaneCollider
+from pyphyslab.physics.particle import ParticleSystem, Particle
+from pyphyslab.physics.snapshot import pack_snapshot, unpack_snapshot
+from pyphyslab.physics.contact import unpack_pairs
+from pyphyslab.physics.integrator import EXPLICIT_EULER
+from pyphyslab.physics.broadphase import make_broadphase, GRID_BROADPHASE
+from pyphyslab.physics.island import IslandContactSolver
+from pyphyslab.physics.ccd import ContinuousCollision
+from pyphyslab.physics.stats import (
+    BROADPHASE_PHASE, NARROWPHASE_PHASE, RESOLVE_PHASE, STATIC_PHASE, LINKS_PHASE, CCD_PHASE, INTEGRATE_PHASE,
+    PAIRS_TESTED_COUNTER, CONTACTS_CREATED_COUNTER, STATIC_CONTACTS_COUNTER, ACTIVE_PARTICLES_COUNTER
+)
 
 class World:
-    def __init__(self, p1, p2):
-        self._p1 = p1
-        self._p2 = p2
+
+    CONTACT_RADIUS = 0.1
+
+    def __init__(self, *particles, contact_radius=None, broadphase=GRID_BROADPHASE, contact_iterations=1, ground=True, integrator=EXPLICIT_EULER, sleeping=False, island_workers=1, continuous=False, link_iterations=8):
+        particles = [particle for particle in particles if particle is not None]
+
+        self._particles = []
+        self._emitters = []
+        self._forces = ForceRegistry()
+        self._links = LinkConstraints(link_iterations)
+        self._system = ParticleSystem(capacity=max(len(particles), 1), integrator=integrator)
         self._particle_collision_detector = ParticleCollisionDetector()
-        self._ground_collision_detectors = []
-        self._ground_collision_detectors.append(GroundCollisionDetector(p1))
+        self._materials = MaterialTable(restitution=ParticleContactResolver.RESTITUTION)
+        self._radius = None if contact_radius is None else contact_radius / 2
+        self._broadphase_name = broadphase
+        self._broadphase_distance = World.CONTACT_RADIUS if contact_radius is None else contact_radius
+        self._broadphase = make_broadphase(broadphase, self._broadphase_distance)
+        self._contact_resolver = BatchContactResolver(contact_iterations)
+        self._island_solver = IslandContactSolver(self._contact_resolver, island_workers)
+        self._static_colliders = StaticColliderSet()
+        self._continuous_collision = ContinuousCollision() if continuous else None
+        self._recorder = None
+        self._stats = None
+        self._diagnostics = None
+        self._sleeping = sleeping
+        self._new_particle_contacts = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self._new_static_contacts = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.time = 0.0
+
+        if ground:
+            self._static_colliders.add(PlaneCollider.ground())
+
+        for particle in particles:
+            self.add_particle(particle)
 
-        if p2:
-            self._ground_collision_detectors.append(GroundCollisionDetector(p2))
-        
     @classmethod
     def single_particle(cls, p1):
-        return cls(p1, None)
+        return cls(p1)
+
+    @property
+    def system(self):
+        return self._system
+
+    @property
+    def broadphase(self):
+        return self._broadphase
+
+    @property
+    def contact_resolver(self):
+        return self._contact_resolver
+
+    @property
+    def island_solver(self):
+        """ Solver of the particle contact islands. island_workers splits the islands over threads with the
+            same result as one worker, but no speedup, as the contact kernel holds the GIL """
+        return self._island_solver
+
+    @property
+    def static_colliders(self):
+        return self._static_colliders
+
+    @property
+    def materials(self):
+        """ Restitution and friction of the particle material pairs. Particle.material indexes it """
+        return self._materials
+
+    @property
+    def continuous_collision(self):
+        """ The swept collision pass run before integration, None when disabled """
+        return self._continuous_collision
+
+    @property
+    def sleeping(self):
+        """ Whether resting particles are put to sleep """
+        return self._sleeping
+
+    @sleeping.setter
+    def sleeping(self, sleeping):
+        self._sleeping = sleeping
+        if not sleeping:
+            self._system.wake(slice(0, self._system.count))
+
+    @property
+    def recorder(self):
+        return self._recorder
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def diagnostics(self):
+        return self._diagnostics
+
+    @property
+    def new_particle_contacts(self):
+        """ (first, second) of the particle contacts which started in the last step """
+        return self._new_particle_contacts
+
+    @property
+    def new_static_contacts(self):
+        """ (particle, collider) of the static contacts resolved in the last step """
+        return self._new_static_contacts
+
+    @property
+    def particles(self):
+        return self._particles
+
+    def add_particle(self, particle):
+        """ Adopt a particle. With a world contact_radius the particle's radius becomes half of it """
+        index = self._system.adopt(particle)
+        if self._radius is not None:
+            self._system.radius[index] = self._radius
+        self._particles.append(particle)
+        return particle
+
+    def add_particles(self, mass, velocity=(0.0, 0.0, 0.0), acceleration=(0.0, 0.0, 0.0), damping=0.85, position=(0.0, 0.0, 0.0), radius=None, material=0):
+        """ Append one particle per entry of mass straight into the system and return their indices """
+        if radius is None:
+            radius = ParticleSystem.RADIUS if self._radius is None else self._radius
+        indices = self._system.add_many(mass, velocity, acceleration, damping, position, radius, material)
+        self._particles.extend(Particle.view(self._system, index) for index in indices)
+        return indices
+
+    def add_emitter(self, emitter):
+        """ Reserve the pool of an emitter and update it before every step """
+        emitter.bind(self._system, self.add_particles(np.full(emitter.capacity, emitter.mass), radius=emitter.radius, material=emitter.material))
+        self._emitters.append(emitter)
+        return emitter
+
+    @property
+    def emitters(self):
+        return self._emitters
+
+    @property
+    def forces(self):
+        """ Force generators applied at the start of every step """
+        return self._forces
+
+    def add_force_generator(self, generator):
+        return self._forces.add(generator)
+
+    @property
+    def links(self):
+        """ Rods and cables between particles, solved after the contacts of every step """
+        return self._links
+
+    def add_rods(self, first, second, length=None):
+        return self._links.add_rods(self._system, first, second, length)
+
+    def add_cables(self, first, second, length=None, restitution=0.0):
+        return self._links.add_cables(self._system, first, second, length, restitution)
+
+    def add_static_collider(self, collider):
+        return self._static_colliders.add(collider)
+
+    def attach_recorder(self, recorder):
+        self._recorder = recorder
+        return recorder
+
+    def detach_recorder(self):
+        recorder = self._recorder
+        self._recorder = None
+        return recorder
+
+    def attach_stats(self, stats):
+        self._stats = stats
+        return stats
+
+    def detach_stats(self):
+        stats = self._stats
+        self._stats = None
+        return stats
+
+    def attach_diagnostics(self, diagnostics):
+        self._diagnostics = diagnostics
+        return diagnostics
+
+    def detach_diagnostics(self):
+        diagnostics = self._diagnostics
+        self._diagnostics = None
+        return diagnostics
+
+    def snapshot(self):
+        """ Binary blob with the time, every particle array, the contact state, the link warm start and the emitter pools """
+        arrays = {"time": np.array(self.time)}
+        for name, array in self._system.state().items():
+            arrays["particle." + name] = array
+        for name, contacts in self._contact_tables().items():
+            arrays[name + ".keys"] = contacts.keys
+            arrays[name + ".age"] = contacts.age
+        arrays["links.impulse"] = self._links.impulse
+        for number, emitter in enumerate(self._emitters):
+            for name, array in emitter.state().items():
+                arrays["emitter.%d.%s" % (number, name)] = array
+        return pack_snapshot(arrays)
+
+    def restore(self, blob):
+        """ Return the world to the state of a snapshot. Static colliders, options, the links and the emitters
+            themselves are not part of it, so restore into a world configured like the one the snapshot was taken from """
+        _, arrays = unpack_snapshot(blob)
+        self.time = float(arrays["time"])
+        self._system.set_state({name[len("particle."):]: array for name, array in arrays.items() if name.startswith("particle.")})
+        for name, contacts in self._contact_tables().items():
+            contacts.restore(arrays[name + ".keys"], arrays[name + ".age"])
+        self._links.restore(arrays.get("links.impulse"))
+        for number, emitter in enumerate(self._emitters):
+            prefix = "emitter.%d." % number
+            emitter.set_state({name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)})
+
+        count = self._system.count
+        del self._particles[count:]
+        for index in range(len(self._particles), count):
+            self._particles.append(Particle.view(self._system, index))
+        self._broadphase = make_broadphase(self._broadphase_name, self._broadphase_distance)
+
+    def _fit_broadphase(self):
+        # Cells and extents must cover the largest contact distance
+        if self._system.count == 0:
+            return
+        distance = 2.0 * self._system.radius.max()
+        if distance > self._broadphase_distance:
+            self._broadphase_distance = distance
+            self._broadphase = make_broadphase(self._broadphase_name, distance)
+
+    def _contact_tables(self):
+        return {
+            "particle_contacts": self._particle_collision_detector.contacts,
+            "static_contacts": self._static_colliders.contacts,
+        }
+
+    def _wake_ended(self, ended_keys):
+        """ Wake the sleeping ends of the particle contacts which ended in this step. Contacts between two
+            sleeping particles are not tested, so they only count as ended when one of them has died """
+        first, second = unpack_pairs(ended_keys)
+        awake = self._system.awake
+        alive = self._system.alive
+        tested = awake[first] | awake[second] | ~alive[first] | ~alive[second]
+        self._system.wake(first[tested & ~awake[first]])
+        self._system.wake(second[tested & ~awake[second]])
 
     def run_physics(self, delta_time):
-        if self._p2 is not None:
-            particle_cotact_resolver = self._particle_collision_detector.detect(self._p1, self._p2)
-            particle_cotact_resolver.resolve(delta_time)
-
-        for ground_collision_detector in self._ground_collision_detectors:
-            ground_contact_resolver = ground_collision_detector.detect()
-            ground_contact_resolver.resolve(delta_time)
-
-        self._p1.resolve(delta_time)
-        
-        if self._p2 is not None:
-            self._p2.resolve(delta_time)
\ No newline at end of file
+        stats = self._stats
+        if stats is not None:
+            stats.begin()
+
+        for emitter in self._emitters:
+            emitter.update(delta_time)
+        # Multi stage integrators evaluate the position and velocity dependent forces at every stage
+        fields = self._system.integrator.STAGES == 1
+        self._forces.apply(self._system, delta_time, fields)
+
+        # Without sleeping only dead particles are ever asleep
+        awake = self._system.awake
+        some_asleep = not awake.all()
+
+        self._fit_broadphase()
+        first, second = self._broadphase.find_pairs(self._system.position, awake if some_asleep else None)
+        if some_asleep:
+            alive = self._system.alive
+            if not alive.all():
+                both_alive = alive[first] & alive[second]
+                first, second = first[both_alive], second[both_alive]
+        if stats is not None:
+            stats.lap(BROADPHASE_PHASE)
+            stats.count(PAIRS_TESTED_COUNTER, len(first))
+
+        contacts = self._particle_collision_detector.contacts
+        previous_keys = contacts.keys
+        first, second, contact_normal = self._particle_collision_detector.detect_pairs(self._system, first, second)
+        if some_asleep:
+            self._wake_ended(previous_keys[~contacts.contains(previous_keys)])
+            self._system.wake(first)
+            self._system.wake(second)
+        if stats is not None:
+            stats.lap(NARROWPHASE_PHASE)
+            stats.count(CONTACTS_CREATED_COUNTER, len(first))
+
+        material = self._system.material
+        restitution, friction = self._materials.pair(material[first], material[second])
+        self._island_solver.resolve(self._system, first, second, contact_normal, restitution, delta_time, friction)
+        self._new_particle_contacts = (first, second)
+        linked = np.empty(0, dtype=np.int64)
+        if len(self._links):
+            pushed = self._links.resolve(self._system, delta_time)
+            # Links carrying load support their ends like contacts do
+            linked = np.concatenate((self._links.first[pushed], self._links.second[pushed]))
+            if some_asleep:
+                self._system.wake(self._links.first[pushed])
+                self._system.wake(self._links.second[pushed])
+        if stats is not None:
+            stats.lap(RESOLVE_PHASE)
+
+        active = np.flatnonzero(self._system.awake) if some_asleep else None
+        particle, collider, contact_normal, distance = self._static_colliders.detect(self._system, active)
+        self._static_colliders.resolve(self._system, particle, collider, contact_normal, distance, delta_time)
+        self._new_static_contacts = (particle, collider)
+        if stats is not None:
+            stats.lap(STATIC_PHASE)
+            stats.count(STATIC_CONTACTS_COUNTER, len(particle))
+
+        if self._continuous_collision is not None:
+            swept_first, swept_second = self._continuous_collision.resolve(
+                self._system, self._particle_collision_detector.contacts, self._contact_resolver, self._static_colliders, self._materials, delta_time,
+                self._broadphase
+            )
+            if len(swept_first):
+                self._new_particle_contacts = (np.concatenate((first, swept_first)), np.concatenate((second, swept_second)))
+            if stats is not None:
+                stats.lap(CCD_PHASE)
+
+        self._system.integrate(delta_time, None if fields else self._forces.acceleration_field(self._system, delta_time))
+        if stats is not None:
+            stats.lap(INTEGRATE_PHASE)
+
+        if len(self._links):
+            violated = self._links.project(self._system, delta_time)
+            if some_asleep:
+                self._system.wake(self._links.first[violated])
+                self._system.wake(self._links.second[violated])
+        if stats is not None:
+            stats.lap(LINKS_PHASE)
+
+        if self._sleeping:
+            touching_first, touching_second = self._particle_collision_detector.contacts.pairs
+            touching = np.concatenate((touching_first, touching_second, self._static_colliders.touching, linked))
+            self._system.update_sleep(delta_time, touching)
+        self.time += delta_time
+        if stats is not None:
+            stats.count(ACTIVE_PARTICLES_COUNTER, self._system.active_count)
+            stats.end()
+
+        if self._diagnostics is not None:
+            self._diagnostics.sample(self, self.time)
+        if self._recorder is not None:
+            self._recorder.record(self, self.time)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from pyphyslab.physics.recorder import load_trajectory, TIME_COLUMN, POSITION_COLUMN
+
+
+class TrajectoryReplay:
+    """ Drives meshes from a recorded trajectory instead of running physics.
+        meshes[i] follows particle i; None entries are skipped. Only the displayed frame is read
+        from the memory mapped file, so seeking through a long recording costs one binary search """
+
+    def __init__(self, directory, meshes, speed=1.0, loop=False):
+        trajectory = load_trajectory(directory)
+        self._time = trajectory[TIME_COLUMN]
+        self._position = trajectory[POSITION_COLUMN]
+        if len(self._time) == 0:
+            raise ValueError("Trajectory is empty: " + str(directory))
+
+        self._meshes = list(meshes)
+        self.speed = speed
+        self.loop = loop
+        self.paused = False
+        self._playback_time = float(self._time[0])
+        self._frame = 0
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def frame_count(self):
+        return len(self._time)
+
+    @property
+    def time(self):
+        return self._playback_time
+
+    @property
+    def start_time(self):
+        return float(self._time[0])
+
+    @property
+    def end_time(self):
+        return float(self._time[-1])
+
+    def seek(self, time):
+        """ Jump to the last recorded frame at or before the given time """
+        self._playback_time = min(max(time, self.start_time), self.end_time)
+        frame = int(np.searchsorted(self._time, self._playback_time, side="right")) - 1
+        self._show(max(frame, 0))
+
+    def seek_frame(self, frame):
+        frame = min(max(int(frame), 0), self.frame_count - 1)
+        self._playback_time = float(self._time[frame])
+        self._show(frame)
+
+    def update(self, delta_time):
+        """ Advance the playback clock. Frames between the old and the new time are skipped """
+        if self.paused:
+            return
+
+        time = self._playback_time + delta_time * self.speed
+        if self.loop and self.end_time > self.start_time:
+            duration = self.end_time - self.start_time
+            time = self.start_time + (time - self.start_time) % duration
+        self.seek(time)
+
+    def _show(self, frame):
+        self._frame = frame
+        position = self._position[frame]
+        for mesh, particle_position in zip(self._meshes, position):
+            if mesh is not None:
+                mesh.set_position(particle_position)